@@ -0,0 +1,233 @@
+import argparse
+import dataclasses
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict
+
+import numpy as np
+import weaviate
+from weaviate.classes.config import Configure, DataType, Property
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from lib.index_profile import (
+    DEFAULT_DIMENSIONS,
+    INDEX_PROFILES,
+    IndexProfile,
+    create_vector_index_config,
+)
+
+
+def create_corpus(
+    object_count: int, query_count: int, dimensions: int, seed: int
+) -> Dict[str, np.ndarray]:
+    """
+    埋め込みを模した合成データを作成する。クラスタ中心の周りに正規化したベクトルを生成する。
+
+    Args:
+        object_count(int): オブジェクト数
+        query_count(int): クエリ数
+        dimensions(int): 次元数
+        seed(int): 乱数シード
+
+    Returns:
+        Dict[str, np.ndarray]: "objects"と"queries"のベクトル
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, object_count // 50), dimensions))
+
+    def sample(count: int) -> np.ndarray:
+        labels = rng.integers(0, len(centers), count)
+        vectors = centers[labels] + 0.5 * rng.standard_normal((count, dimensions))
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(
+            np.float32
+        )
+
+    return {"objects": sample(object_count), "queries": sample(query_count)}
+
+
+def truncate(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    ベクトルを先頭から指定の次元数に切り詰めて正規化する(text-embedding-3のdimensions指定と同等)
+
+    Args:
+        vectors(np.ndarray): ベクトル
+        dimensions(int): 次元数
+
+    Returns:
+        np.ndarray: 切り詰めたベクトル
+    """
+    vectors = vectors[:, :dimensions]
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def wait_for_indexing(
+    collection: Any, timeout: float = 600.0, interval: float = 0.5
+) -> None:
+    """
+    非同期インデックスが有効な場合に、全シャードのベクトルインデックスの作成が終わるまで待つ
+
+    Args:
+        collection(Any): コレクション
+        timeout(float): 最大の待ち時間[s]
+        interval(float): 確認の間隔[s]
+    """
+    deadline = time.perf_counter() + timeout
+    while True:
+        shards = collection.config.get_shards()
+        if all(
+            shard.vector_queue_length == 0 and shard.vector_indexing_status == "READY"
+            for shard in shards
+        ):
+            return
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"Vector indexing did not finish in {timeout} s")
+        time.sleep(interval)
+
+
+def run_profile(
+    client: weaviate.WeaviateClient,
+    name: str,
+    profile: IndexProfile,
+    corpus: Dict[str, np.ndarray],
+    ground_truth: np.ndarray,
+    limit: int,
+    keep: bool,
+) -> Dict[str, float]:
+    """
+    インデックス設定ごとにコレクションを作成し、検索のレイテンシと再現率を計測する
+
+    Args:
+        client(weaviate.WeaviateClient): Weaviateクライアント
+        name(str): インデックス設定名
+        profile(IndexProfile): インデックス設定
+        corpus(Dict[str, np.ndarray]): 合成データ
+        ground_truth(np.ndarray): 全件探索による各クエリの正解インデックス
+        limit(int): 検索結果の数
+        keep(bool): 計測後にコレクションを残すかどうか
+
+    Returns:
+        Dict[str, float]: 計測結果
+    """
+    collection_name = f"IndexBenchmark_{name}"
+    if client.collections.exists(collection_name):
+        client.collections.delete(collection_name)
+    dimensions = profile.dimensions or DEFAULT_DIMENSIONS
+    objects = truncate(corpus["objects"], dimensions)
+    queries = truncate(corpus["queries"], dimensions)
+    collection = client.collections.create(
+        name=collection_name,
+        vectorizer_config=Configure.Vectorizer.none(),
+        vector_index_config=create_vector_index_config(profile),
+        properties=[Property(name="index", data_type=DataType.INT)],
+    )
+    try:
+        start = time.perf_counter()
+        with collection.batch.dynamic() as batch:
+            for i, vector in enumerate(objects):
+                batch.add_object(properties={"index": i}, vector=vector.tolist())
+        if len(collection.batch.failed_objects) > 0:
+            raise ValueError(
+                f"Failed to insert {len(collection.batch.failed_objects)} objects"
+            )
+        # 作成途中のインデックスで計測しないよう、キューが空になるまで待つ
+        wait_for_indexing(collection)
+        insert_time = time.perf_counter() - start
+        latencies = []
+        recalls = []
+        for query, truth in zip(queries, ground_truth):
+            start = time.perf_counter()
+            response = collection.query.near_vector(
+                near_vector=query.tolist(), limit=limit, return_properties=["index"]
+            )
+            latencies.append(time.perf_counter() - start)
+            found = {obj.properties["index"] for obj in response.objects}
+            recalls.append(len(found & set(truth.tolist())) / limit)
+    finally:
+        if not keep:
+            client.collections.delete(collection_name)
+    latencies.sort()
+    return {
+        "memory": profile.estimate_memory(len(objects)),
+        "compressed": profile.is_compressed(len(objects)),
+        "insert": insert_time,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "recall": statistics.mean(recalls),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Weaviate host")
+    parser.add_argument("--port", type=int, default=10080, help="Weaviate port")
+    parser.add_argument(
+        "-p",
+        "--profiles",
+        nargs="+",
+        type=str,
+        default=list(INDEX_PROFILES.keys()),
+        choices=INDEX_PROFILES.keys(),
+        help="Index profile names to benchmark",
+    )
+    parser.add_argument(
+        "-n", "--objects", type=int, default=5000, help="Number of objects"
+    )
+    parser.add_argument(
+        "-q", "--queries", type=int, default=100, help="Number of queries"
+    )
+    parser.add_argument("-k", "--limit", type=int, default=3, help="Search limit")
+    parser.add_argument(
+        "--training_limit",
+        type=int,
+        help="Override training limit of pq/sq profiles (requires ASYNC_INDEXING)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep benchmark collections"
+    )
+    args = parser.parse_args()
+    corpus = create_corpus(args.objects, args.queries, DEFAULT_DIMENSIONS, args.seed)
+    # 正解は次元削減前のベクトルの全件探索で求める
+    scores = corpus["queries"] @ corpus["objects"].T
+    ground_truth = np.argsort(-scores, axis=1)[:, : args.limit]
+    client = weaviate.connect_to_local(host=args.host, port=args.port)
+    print(
+        f"objects: {args.objects}, queries: {args.queries}, limit: {args.limit}, "
+        f"dimensions: {DEFAULT_DIMENSIONS}"
+    )
+    print(
+        f"{'profile':<12}{'memory[MB]':>12}{'compressed':>12}{'insert[s]':>11}{'p50[ms]':>10}{'p95[ms]':>10}{'recall':>8}"
+    )
+    try:
+        for name in args.profiles:
+            # 本番のコレクションと同じ学習開始数を使う。--training_limitで変更できる
+            profile = INDEX_PROFILES[name]
+            if args.training_limit is not None:
+                profile = dataclasses.replace(
+                    profile, training_limit=args.training_limit
+                )
+            result = run_profile(
+                client=client,
+                name=name,
+                profile=profile,
+                corpus=corpus,
+                ground_truth=ground_truth,
+                limit=args.limit,
+                keep=args.keep,
+            )
+            print(
+                f"{name:<12}{result['memory'] / 1024 / 1024:>12.1f}{'yes' if result['compressed'] else 'no':>12}{result['insert']:>11.2f}"
+                f"{result['p50'] * 1000:>10.2f}{result['p95'] * 1000:>10.2f}{result['recall']:>8.3f}"
+            )
+    finally:
+        client.close()
+    print("memory: estimated resident size of the vector index")
+    print(
+        "compressed: pq/sq compress only after training_limit objects and with ASYNC_INDEXING enabled"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+# 計測対象のスクリプト(モジュール名)
+SCRIPTS = [
+    "rag_gpt_publisher",
+    "weaviate_qa_example",
+    "weaviate_search_example",
+    "weaviate_get_objects_example",
+    "weaviate_uploader",
+    "weaviate_snapshot",
+    "weaviate_tenant_manager",
+]
+
+IMPORT_CODE = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+READY_CODE = """
+import time
+start = time.perf_counter()
+from lib.weaviate_rag_controller import WeaviateRagController
+controller = WeaviateRagController(host="{host}", port={port})
+connected = time.perf_counter()
+controller.hybrid_search(collection_name="{collection}", text="AKARI", limit=1)
+print(connected - start, time.perf_counter() - start)
+"""
+
+# 起動完了までの時間を計測するスクリプトと、起動完了時に標準出力に表示される文字列
+READY_SCRIPTS: Dict[str, Tuple[List[str], str]] = {
+    "rag_gpt_publisher": (
+        [
+            "rag_gpt_publisher.py",
+            "--weaviate_host",
+            "{host}",
+            "--weaviate_port",
+            "{port}",
+            "--port",
+            "{gpt_port}",
+            "-c",
+            "{collection}",
+        ],
+        "gpt_publisher start",
+    ),
+    "weaviate_search_example": (
+        [
+            "weaviate_search_example.py",
+            "--host",
+            "{host}",
+            "--port",
+            "{port}",
+            "-c",
+            "{collection}",
+        ],
+        "文章をキーボード入力後",
+    ),
+    "weaviate_qa_example": (
+        [
+            "weaviate_qa_example.py",
+            "--host",
+            "{host}",
+            "--port",
+            "{port}",
+            "-c",
+            "{collection}",
+        ],
+        "文章をキーボード入力後",
+    ),
+}
+
+
+def run_python(code: str, args: Optional[List[str]] = None) -> Tuple[str, str]:
+    """
+    新しいPythonプロセスでコードを実行し、標準出力と標準エラー出力を返す
+
+    Args:
+        code(str): 実行するコード
+        args(List[str]): Pythonに渡す追加の引数
+
+    Returns:
+        Tuple[str, str]: 標準出力と標準エラー出力
+    """
+    if args is None:
+        args = []
+    result = subprocess.run(
+        [sys.executable] + args + ["-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().split("\n")[-1])
+    return result.stdout, result.stderr
+
+
+def find_free_port() -> int:
+    """
+    空いているTCPポート番号を取得する
+
+    Returns:
+        int: ポート番号
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(args: List[str], ready_text: str, timeout: float) -> float:
+    """
+    スクリプトを起動し、起動完了の文字列が標準出力に表示されるまでの時間を計測する
+    計測後はプロセスを終了する。
+
+    Args:
+        args(List[str]): スクリプトと引数
+        ready_text(str): 起動完了時に表示される文字列
+        timeout(float): タイムアウト[s]
+
+    Returns:
+        float: 起動完了までの時間[s]
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-u"] + args,
+        cwd=ROOT_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        last_line = ""
+        for line in process.stdout:
+            if ready_text in line:
+                return time.perf_counter() - start
+            if line.strip() != "":
+                last_line = line.strip()
+        raise RuntimeError(f"exited before ready or timed out: {last_line}")
+    finally:
+        timer.cancel()
+        process.kill()
+        process.wait()
+
+
+def measure_import(module: str, repeat: int) -> List[float]:
+    """
+    モジュールのimport時間を計測する
+
+    Args:
+        module(str): モジュール名
+        repeat(int): 計測回数
+
+    Returns:
+        List[float]: import時間[s]のリスト
+    """
+    times = []
+    for _ in range(repeat):
+        stdout, _ = run_python(IMPORT_CODE.format(module=module))
+        times.append(float(stdout.strip().split("\n")[-1]))
+    return times
+
+
+def show_slowest_imports(module: str, top: int) -> None:
+    """
+    -X importtimeの結果から、累積import時間の長いモジュールを表示する
+
+    Args:
+        module(str): モジュール名
+        top(int): 表示する数
+    """
+    _, stderr = run_python(f"import {module}", args=["-X", "importtime"])
+    rows = []
+    for line in stderr.split("\n"):
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # 形式: "import time: {self [us]} | {cumulative [us]} | {module}"
+        self_us, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us), int(self_us.split(":")[-1]), name))
+    rows.sort(reverse=True)
+    print(f"Slowest imports of {module}:")
+    for cumulative_us, self_us, name in rows[:top]:
+        print(
+            f"  {cumulative_us / 1000:8.1f} [ms] (self {self_us / 1000:6.1f} [ms])  {name.strip()}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Weaviate host")
+    parser.add_argument("--port", type=int, default=10080, help="Weaviate port")
+    parser.add_argument(
+        "-c",
+        "--collection",
+        type=str,
+        default="Test",
+        help="Weaviate collection name",
+    )
+    parser.add_argument(
+        "-n", "--repeat", type=int, default=5, help="Number of measurements"
+    )
+    parser.add_argument(
+        "-s",
+        "--scripts",
+        nargs="+",
+        type=str,
+        default=SCRIPTS,
+        help="Script module names to measure",
+    )
+    parser.add_argument(
+        "--ready",
+        action="store_true",
+        help="Measure time until the controller finishes first search and each script is ready",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="Timeout for each --ready measurement [s]",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        help="Show the slowest imports of each script",
+    )
+    args = parser.parse_args()
+    print(f"Import time (median of {args.repeat} runs)")
+    for module in args.scripts:
+        try:
+            times = measure_import(module, args.repeat)
+        except RuntimeError as e:
+            print(f"  {module}: failed ({str(e)})")
+            continue
+        print(
+            f"  {module}: {statistics.median(times):.3f} [s] (min: {min(times):.3f} [s], max: {max(times):.3f} [s])"
+        )
+        if args.top > 0:
+            show_slowest_imports(module, args.top)
+    if args.ready:
+        connect_times = []
+        ready_times = []
+        for _ in range(args.repeat):
+            stdout, _ = run_python(
+                READY_CODE.format(
+                    host=args.host, port=args.port, collection=args.collection
+                )
+            )
+            connect_time, ready_time = stdout.strip().split("\n")[-1].split()
+            connect_times.append(float(connect_time))
+            ready_times.append(float(ready_time))
+        print(f"First-ready time (median of {args.repeat} runs)")
+        print(f"  controller connect: {statistics.median(connect_times):.3f} [s]")
+        print(f"  controller first search: {statistics.median(ready_times):.3f} [s]")
+        # チャットクライアントやgRPCサーバの初期化を含め、各スクリプトが入力を受け付けるまでの時間
+        for name, (script_args, ready_text) in READY_SCRIPTS.items():
+            times = []
+            try:
+                for _ in range(args.repeat):
+                    times.append(
+                        measure_ready(
+                            [
+                                arg.format(
+                                    host=args.host,
+                                    port=args.port,
+                                    gpt_port=find_free_port(),
+                                    collection=args.collection,
+                                )
+                                for arg in script_args
+                            ],
+                            ready_text,
+                            args.timeout,
+                        )
+                    )
+            except RuntimeError as e:
+                print(f"  {name}: failed ({str(e)})")
+                continue
+            print(
+                f"  {name}: {statistics.median(times):.3f} [s] (min: {min(times):.3f} [s], max: {max(times):.3f} [s])"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+import hashlib
+import json
+import os
+import random
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# MinHashの計算に使う素数(2^31 - 1)
+MINHASH_PRIME = (1 << 31) - 1
+INDEX_VERSION = 1
+
+
+class ChunkDedupIndex(object):
+    """
+    チャンクの完全一致と類似(MinHash + LSH)による重複を検出するインデックス
+    シグネチャはファイルに保存し、次回のアップロード時に再利用する。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        collection_name: str,
+        threshold: float = 0.8,
+        num_perm: int = 64,
+        bands: int = 8,
+        shingle_size: int = 5,
+        tenant: Optional[str] = None,
+    ) -> None:
+        """
+        コンストラクタ
+
+        Args:
+            path(str): インデックスファイル(JSON)のパス。存在する場合は読み込む。
+            collection_name(str): コレクション名
+            threshold(float): 類似とみなす推定Jaccard係数の下限
+            num_perm(int): MinHashのハッシュ関数の数
+            bands(int): LSHのバンド数。num_permを割り切れる数にすること。
+            shingle_size(int): シングル(文字n-gram)の文字数
+            tenant(str): テナント名。マルチテナンシーのコレクションではテナントごとにインデックスを分ける。
+        """
+        import numpy as np
+
+        if num_perm % bands != 0:
+            raise ValueError(
+                f"num_perm ({num_perm}) must be divisible by bands ({bands})."
+            )
+        self.path = path
+        self.collection_name = collection_name.capitalize()
+        self.tenant = tenant
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # ハッシュ関数の係数。同じシードで毎回同じ値にする
+        rng = np.random.default_rng(1)
+        self.a = rng.integers(1, MINHASH_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MINHASH_PRIME, num_perm, dtype=np.uint64)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hashes: Dict[str, str] = {}
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], Set[str]] = {}
+        self.stats = {"total": 0, "exact": 0, "near": 0, "unique": 0}
+        # 置き換え中のチャンクのうち、参照を新しいチャンクに引き継いだもの
+        self.transferred: Set[str] = set()
+        # 重複として参照していたチャンクが削除され、再アップロードが必要なソース
+        self.orphaned_sources: Set[str] = set()
+        self.loaded = False
+        if os.path.exists(self.path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported dedup index version: {data.get('version')}")
+        if data["collection"] != self.collection_name:
+            raise ValueError(
+                f"Dedup index {self.path} is for collection {data['collection']}, not {self.collection_name}."
+            )
+        if data.get("tenant") != self.tenant:
+            raise ValueError(
+                f"Dedup index {self.path} is for tenant {data.get('tenant')}, not {self.tenant}."
+            )
+        if (
+            data["num_perm"] != self.num_perm
+            or data["shingle_size"] != self.shingle_size
+        ):
+            raise ValueError(
+                f"Dedup index {self.path} was created with different MinHash parameters."
+            )
+        for uuid, entry in data["entries"].items():
+            self._add_entry(uuid, entry)
+        self.loaded = True
+
+    def save(self) -> None:
+        """
+        インデックスファイルを保存。書き込み途中で中断しても壊れないよう、一時ファイルから置き換える。
+        """
+        data = {
+            "version": INDEX_VERSION,
+            "collection": self.collection_name,
+            "tenant": self.tenant,
+            "num_perm": self.num_perm,
+            "shingle_size": self.shingle_size,
+            "entries": self.entries,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.loaded = True
+
+    def _normalize(self, text: str) -> str:
+        text = unicodedata.normalize("NFKC", text).lower()
+        return re.sub(r"\s+", " ", text).strip()
+
+    def _signature(self, text: str) -> List[int]:
+        import numpy as np
+
+        size = self.shingle_size
+        shingles = {text[i : i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.array(
+            [
+                int.from_bytes(
+                    hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(),
+                    "little",
+                )
+                for shingle in shingles
+            ],
+            dtype=np.uint64,
+        )
+        hashes %= MINHASH_PRIME
+        values = (np.outer(self.a, hashes) + self.b[:, None]) % MINHASH_PRIME
+        return values.min(axis=1).tolist()
+
+    def _band_keys(self, signature: List[int]) -> List[Tuple[int, Tuple[int, ...]]]:
+        return [
+            (band, tuple(signature[band * self.rows : (band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    def _add_entry(self, uuid: str, entry: Dict[str, Any]) -> None:
+        self.entries[uuid] = entry
+        self.hashes[entry["hash"]] = uuid
+        for key in self._band_keys(entry["signature"]):
+            self.buckets.setdefault(key, set()).add(uuid)
+
+    def _similarity(self, a: List[int], b: List[int]) -> float:
+        return sum(1 for x, y in zip(a, b) if x == y) / self.num_perm
+
+    def check_and_add(
+        self,
+        uuid: str,
+        content: str,
+        source: str,
+        replaced_uuids: Optional[Set[str]] = None,
+    ) -> Optional[str]:
+        """
+        チャンクが既存のチャンクと重複しているか確認し、重複していない場合はインデックスに追加する
+        同じソース内で繰り返されるチャンク(ページごとのヘッダーなど)も重複として扱う。
+        置き換え対象のチャンクは削除されるため重複の対象にしない。置き換え対象のチャンクと一致する場合は、
+        それを重複として参照していたソースを、新しいチャンクもしくは一致した既存のチャンクに引き継ぐ。
+
+        Args:
+            uuid(str): アップロードするチャンクのUUID
+            content(str): チャンクの本文
+            source(str): ソース名
+            replaced_uuids(Set[str]): 再アップロードで置き換えられる同じソースのチャンクのUUID
+
+        Returns:
+            Optional[str]: 重複している既存チャンクのUUID。重複していない場合はNone。
+        """
+        if replaced_uuids is None:
+            replaced_uuids = set()
+        self.stats["total"] += 1
+        text = self._normalize(content)
+        content_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        signature = self._signature(text)
+        inherited_refs: Set[str] = set()
+        duplicate = None
+        kind = "exact"
+        exact = self.hashes.get(content_hash)
+        if exact is not None and exact not in replaced_uuids:
+            duplicate = exact
+        candidates: Set[str] = set()
+        for key in self._band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+        if exact is not None:
+            candidates.add(exact)
+        for candidate in sorted(candidates):
+            entry = self.entries[candidate]
+            if candidate in replaced_uuids:
+                if (
+                    candidate == exact
+                    or self._similarity(signature, entry["signature"]) >= self.threshold
+                ):
+                    inherited_refs.update(entry["refs"])
+                    self.transferred.add(candidate)
+                continue
+            if (
+                duplicate is None
+                and self._similarity(signature, entry["signature"]) >= self.threshold
+            ):
+                duplicate = candidate
+                kind = "near"
+        if duplicate is not None:
+            self.stats[kind] += 1
+            for ref in {source} | inherited_refs:
+                self._add_reference(duplicate, ref)
+            return duplicate
+        self.stats["unique"] += 1
+        self._add_entry(
+            str(uuid),
+            {
+                "hash": content_hash,
+                "signature": signature,
+                "source": source,
+                "refs": sorted(inherited_refs - {source}),
+            },
+        )
+        return None
+
+    def _add_reference(self, uuid: str, source: str) -> None:
+        entry = self.entries[uuid]
+        # 同じソース内の重複は、ソースの再アップロードで一緒に置き換わるため参照として記録しない
+        if source != entry["source"] and source not in entry["refs"]:
+            entry["refs"].append(source)
+
+    def remove_references(self, source: str) -> None:
+        """
+        ソースからの参照を削除
+
+        Args:
+            source(str): ソース名
+        """
+        for entry in self.entries.values():
+            if source in entry["refs"]:
+                entry["refs"].remove(source)
+
+    def get_uuids_by_source(self, source: str) -> List[str]:
+        """
+        ソース名でインデックス内のチャンクのUUIDを取得
+
+        Args:
+            source(str): ソース名
+
+        Returns:
+            List[str]: チャンクのUUIDリスト
+        """
+        return [
+            uuid for uuid, entry in self.entries.items() if entry["source"] == source
+        ]
+
+    def remove(self, uuids: List[str]) -> Set[str]:
+        """
+        チャンクをインデックスから削除
+
+        Args:
+            uuids(List[str]): 削除するチャンクのUUIDリスト
+
+        Returns:
+            Set[str]: 削除したチャンクを重複として参照していたソース名
+        """
+        referenced_sources: Set[str] = set()
+        for uuid in uuids:
+            entry = self.entries.pop(str(uuid), None)
+            if entry is None:
+                continue
+            referenced_sources.update(entry["refs"])
+            if self.hashes.get(entry["hash"]) == str(uuid):
+                del self.hashes[entry["hash"]]
+            for key in self._band_keys(entry["signature"]):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(str(uuid))
+                    if len(bucket) == 0:
+                        del self.buckets[key]
+        return referenced_sources
+
+    def commit_replacement(self, replaced_uuids: Set[str], source: str) -> Set[str]:
+        """
+        ソースの再アップロードが成功した後に、置き換えられた古いチャンクをインデックスから削除する
+        古いチャンクを重複として参照していたソースのうち、参照を引き継げなかったものを記録する。
+
+        Args:
+            replaced_uuids(Set[str]): 置き換えられた古いチャンクのUUID
+            source(str): 再アップロードしたソース名
+
+        Returns:
+            Set[str]: 重複先のチャンクを失い、再アップロードが必要なソース名
+        """
+        orphaned: Set[str] = set()
+        for uuid in replaced_uuids:
+            entry = self.entries.get(str(uuid))
+            if entry is not None and str(uuid) not in self.transferred:
+                orphaned.update(entry["refs"])
+        self.remove(list(replaced_uuids))
+        self.transferred.clear()
+        orphaned.discard(source)
+        self.orphaned_sources |= orphaned
+        return orphaned
+
+    def rollback_replacement(self, new_uuids: List[str]) -> None:
+        """
+        ソースの再アップロードが失敗した場合に、追加した新しいチャンクをインデックスから削除する
+        古いチャンクとその参照は残す。
+
+        Args:
+            new_uuids(List[str]): 追加した新しいチャンクのUUID
+        """
+        self.remove(new_uuids)
+        self.transferred.clear()
+
+    def pop_orphaned_sources(self) -> Set[str]:
+        """
+        再アップロードが必要なソース名を取得し、記録を消去する
+
+        Returns:
+            Set[str]: 再アップロードが必要なソース名
+        """
+        orphaned = self.orphaned_sources
+        self.orphaned_sources = set()
+        return orphaned
+
+    def sample_uuids(self, count: int) -> List[str]:
+        """
+        コレクションとの整合性の確認用に、インデックス内のチャンクのUUIDを無作為に取得
+
+        Args:
+            count(int): 取得する最大数
+
+        Returns:
+            List[str]: チャンクのUUIDリスト
+        """
+        return random.sample(list(self.entries.keys()), min(count, len(self.entries)))
+
+    def build(self, objects: List[Any]) -> None:
+        """
+        コレクション内の既存オブジェクトからインデックスを作り直す
+        残っているオブジェクトの参照は引き継ぎ、削除されたオブジェクトを参照していたソースは再アップロードが必要として記録する。
+
+        Args:
+            objects(List[Any]): get_objects()で取得したオブジェクトのリスト
+        """
+        old_refs = {uuid: entry["refs"] for uuid, entry in self.entries.items()}
+        self.entries = {}
+        self.hashes = {}
+        self.buckets = {}
+        for obj in objects:
+            text = self._normalize(obj.properties["content"])
+            self._add_entry(
+                str(obj.uuid),
+                {
+                    "hash": hashlib.sha1(text.encode("utf-8")).hexdigest(),
+                    "signature": self._signature(text),
+                    "source": obj.properties["source"],
+                    "refs": old_refs.pop(str(obj.uuid), []),
+                },
+            )
+        for refs in old_refs.values():
+            self.orphaned_sources.update(refs)
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        重複検出の集計を取得
+
+        Returns:
+            Dict[str, float]: 確認したチャンク数、完全一致数、類似数、非重複数と重複率
+        """
+        stats: Dict[str, float] = dict(self.stats)
+        duplicates = self.stats["exact"] + self.stats["near"]
+        stats["dedup_ratio"] = (
+            duplicates / self.stats["total"] if self.stats["total"] > 0 else 0.0
+        )
+        return stats
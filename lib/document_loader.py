@@ -0,0 +1,540 @@
+import multiprocessing
+import os
+import queue
+import re
+from collections import deque
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, Type
+
+# ファイル読み込み時のブロックサイズ(文字数)
+READ_BLOCK_SIZE = 64 * 1024
+# 段落区切りが見つからない場合に強制的に分割する文字数
+MAX_BLOCK_CHARS = 8 * 1024
+# チャンクサイズを超える段落を分割する区切り文字。先頭から順に試す
+BLOCK_SEPARATORS = ["\n", "。", "！", "？", ". ", "、", " "]
+
+
+@dataclass
+class TextBlock:
+    """
+    パーサが出力するテキストの断片(段落単位)
+    """
+
+    text: str
+    page: Optional[int] = None
+    section: Optional[str] = None
+
+
+@dataclass
+class DocumentChunk:
+    """
+    Weaviateにアップロードするチャンク
+    """
+
+    content: str
+    page: Optional[int] = None
+    section: Optional[str] = None
+
+
+def _split_paragraphs(buffer: str, final: bool = False) -> Tuple[List[str], str]:
+    """
+    バッファを空行で段落に分割し、確定した段落と未確定の残りを返す
+
+    Args:
+        buffer(str): 読み込み済みのテキスト
+        final(bool): ファイル末尾の場合True。残りも段落として確定する。
+
+    Returns:
+        Tuple[List[str], str]: 確定した段落のリストと、残りのバッファ
+    """
+    paragraphs = buffer.split("\n\n")
+    rest = "" if final else paragraphs.pop()
+    # 段落区切りのない巨大なテキストでメモリが増え続けないよう分割する
+    while len(rest) > MAX_BLOCK_CHARS:
+        cut = rest.rfind("\n", 0, MAX_BLOCK_CHARS)
+        if cut <= 0:
+            cut = MAX_BLOCK_CHARS
+        paragraphs.append(rest[:cut])
+        rest = rest[cut:]
+    return [p for p in paragraphs if p.strip() != ""], rest
+
+
+def _read_blocks(file_path: str) -> Iterator[str]:
+    """
+    ファイルを少しずつ読み込み、段落単位で返す
+
+    Args:
+        file_path(str): ファイルパス
+
+    Yields:
+        str: 段落
+    """
+    buffer = ""
+    with open(file_path, "r", encoding="utf-8") as file:
+        while True:
+            data = file.read(READ_BLOCK_SIZE)
+            if not data:
+                break
+            paragraphs, buffer = _split_paragraphs(buffer + data)
+            yield from paragraphs
+    paragraphs, _ = _split_paragraphs(buffer, final=True)
+    yield from paragraphs
+
+
+class DocumentParser(object):
+    """
+    ドキュメントからテキストを抽出するパーサの基底クラス
+    """
+
+    def parse(self, file_path: str) -> Iterator[TextBlock]:
+        """
+        ファイルを読み込み、段落単位のテキストを返す
+
+        Args:
+            file_path(str): ファイルパス
+
+        Yields:
+            TextBlock: 抽出したテキスト
+        """
+        raise NotImplementedError
+
+
+class TextParser(DocumentParser):
+    """
+    テキストファイルのパーサ
+    """
+
+    def parse(self, file_path: str) -> Iterator[TextBlock]:
+        for paragraph in _read_blocks(file_path):
+            yield TextBlock(text=paragraph)
+
+
+class MarkdownParser(DocumentParser):
+    """
+    Markdownファイルのパーサ。見出しをsectionとして記録する。
+    """
+
+    HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s+(.*?)\s*#*\s*$")
+    FENCE_PATTERN = re.compile(r"^\s{0,3}(`{3,}|~{3,})")
+
+    def parse(self, file_path: str) -> Iterator[TextBlock]:
+        section = None
+        # コードブロック内の"# コメント"などを見出しとして扱わないよう、開始したフェンスを記録する
+        fence: Optional[str] = None
+        for paragraph in _read_blocks(file_path):
+            lines: List[str] = []
+            for line in paragraph.split("\n"):
+                fence_match = self.FENCE_PATTERN.match(line)
+                if fence is None and fence_match is not None:
+                    fence = fence_match.group(1)
+                elif (
+                    fence is not None
+                    and fence_match is not None
+                    and fence_match.group(1).startswith(fence)
+                    and line.strip() == fence_match.group(1)
+                ):
+                    fence = None
+                    lines.append(line)
+                    continue
+                match = self.HEADING_PATTERN.match(line) if fence is None else None
+                if match is None:
+                    lines.append(line)
+                    continue
+                # 見出しの前までを前のsectionのテキストとして確定する
+                if "".join(lines).strip() != "":
+                    yield TextBlock(text="\n".join(lines), section=section)
+                section = match.group(1)
+                lines = [line]
+            if "".join(lines).strip() != "":
+                yield TextBlock(text="\n".join(lines), section=section)
+
+
+class _HtmlTextExtractor(HTMLParser):
+    """
+    HTMLからブロック要素単位でテキストを取り出す
+    """
+
+    BLOCK_TAGS = {
+        "p",
+        "div",
+        "li",
+        "ul",
+        "ol",
+        "tr",
+        "table",
+        "section",
+        "article",
+        "header",
+        "footer",
+        "pre",
+        "blockquote",
+        "br",
+        "dt",
+        "dd",
+    }
+    HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+    SKIP_TAGS = {"script", "style", "noscript", "head"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.blocks: Deque[TextBlock] = deque()
+        self.section: Optional[str] = None
+        self._texts: List[str] = []
+        self._heading: Optional[List[str]] = None
+        self._skip_depth = 0
+
+    def _flush(self) -> None:
+        text = "".join(self._texts).strip()
+        self._texts = []
+        if text != "":
+            self.blocks.append(TextBlock(text=text, section=self.section))
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.HEADING_TAGS:
+            self._flush()
+            self._heading = []
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.HEADING_TAGS and self._heading is not None:
+            heading = "".join(self._heading).strip()
+            self._heading = None
+            if heading != "":
+                self.section = heading
+                self._texts.append(heading)
+            self._flush()
+        elif tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_depth > 0:
+            return
+        if self._heading is not None:
+            self._heading.append(data)
+            return
+        self._texts.append(data)
+        if sum(len(text) for text in self._texts) > MAX_BLOCK_CHARS:
+            self._flush()
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+
+class HtmlParser(DocumentParser):
+    """
+    HTMLファイルのパーサ。見出し(h1~h6)をsectionとして記録する。
+    """
+
+    def parse(self, file_path: str) -> Iterator[TextBlock]:
+        extractor = _HtmlTextExtractor()
+        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            while True:
+                data = file.read(READ_BLOCK_SIZE)
+                if not data:
+                    break
+                extractor.feed(data)
+                while len(extractor.blocks) > 0:
+                    yield extractor.blocks.popleft()
+        extractor.close()
+        while len(extractor.blocks) > 0:
+            yield extractor.blocks.popleft()
+
+
+class PdfParser(DocumentParser):
+    """
+    PDFファイルのパーサ。ページ番号をpageとして記録する。pypdfが必要。
+    """
+
+    def parse(self, file_path: str) -> Iterator[TextBlock]:
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            raise ImportError(
+                "pypdf is required to parse PDF files. Please run 'pip install pypdf'."
+            )
+        reader = PdfReader(file_path)
+        for page_number, page in enumerate(reader.pages, start=1):
+            text = page.extract_text() or ""
+            paragraphs, _ = _split_paragraphs(text, final=True)
+            for paragraph in paragraphs:
+                yield TextBlock(text=paragraph, page=page_number)
+
+
+# 拡張子とパーサの対応表。register_parser()で追加できる。
+PARSERS: Dict[str, Type[DocumentParser]] = {
+    ".txt": TextParser,
+    ".md": MarkdownParser,
+    ".markdown": MarkdownParser,
+    ".html": HtmlParser,
+    ".htm": HtmlParser,
+    ".pdf": PdfParser,
+}
+
+
+def register_parser(extension: str, parser: Type[DocumentParser]) -> None:
+    """
+    拡張子に対応するパーサを登録する
+
+    Args:
+        extension(str): 拡張子(例: ".docx")
+        parser(Type[DocumentParser]): パーサのクラス
+    """
+    PARSERS[extension.lower()] = parser
+
+
+def is_supported_file(file_path: str) -> bool:
+    """
+    パーサが登録されているファイルか確認
+
+    Args:
+        file_path(str): ファイルパス
+
+    Returns:
+        bool: 対応している場合True
+    """
+    return os.path.splitext(file_path)[1].lower() in PARSERS
+
+
+def get_parser(file_path: str) -> DocumentParser:
+    """
+    ファイルの拡張子に対応するパーサを取得
+
+    Args:
+        file_path(str): ファイルパス
+
+    Returns:
+        DocumentParser: パーサ
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in PARSERS:
+        raise ValueError(f"Unsupported file type: {file_path}")
+    return PARSERS[extension]()
+
+
+def _split_text(
+    text: str,
+    chunk_size: int,
+    length_function: Callable[[str], int],
+    separators: List[str],
+) -> List[str]:
+    """
+    テキストがchunk_size以下になるまで区切り文字で再帰的に分割する
+    区切り文字で分割できない場合は文字数で半分に分割する。
+
+    Args:
+        text(str): テキスト
+        chunk_size(int): 分割後の最大の長さ
+        length_function(Callable[[str], int]): 長さの計算関数
+        separators(List[str]): 区切り文字。先頭から順に試す
+
+    Returns:
+        List[str]: 分割したテキスト。区切り文字は前の断片の末尾に残す
+    """
+    if length_function(text) <= chunk_size:
+        return [text]
+    for i, separator in enumerate(separators):
+        parts = text.split(separator)
+        pieces = [part + separator for part in parts[:-1]] + [parts[-1]]
+        pieces = [piece.strip() for piece in pieces if piece.strip() != ""]
+        if len(pieces) <= 1:
+            continue
+        results = []
+        for piece in pieces:
+            results.extend(
+                _split_text(piece, chunk_size, length_function, separators[i + 1 :])
+            )
+        return results
+    if len(text) <= 1:
+        return [text]
+    middle = len(text) // 2
+    return _split_text(text[:middle], chunk_size, length_function, []) + _split_text(
+        text[middle:], chunk_size, length_function, []
+    )
+
+
+def chunk_blocks(
+    blocks: Iterator[TextBlock],
+    chunk_size: int = 512,
+    chunk_overlap: int = 128,
+    separator: str = "\n\n",
+    length_function: Optional[Callable[[str], int]] = None,
+) -> Iterator[DocumentChunk]:
+    """
+    段落をトークン数に応じてチャンクにまとめる。
+    CharacterTextSplitter.from_tiktoken_encoder()と同様の分割を逐次的に行うため、
+    保持するのは作成中のチャンク分のテキストのみ。
+    chunk_sizeを超える段落は、改行や句点(BLOCK_SEPARATORSを参照)で分割してからまとめる。
+
+    Args:
+        blocks(Iterator[TextBlock]): 段落のイテレータ
+        chunk_size(int): チャンクサイズ(トークン数)
+        chunk_overlap(int): チャンクのオーバーラップ(トークン数)
+        separator(str): 段落を結合する区切り文字
+        length_function(Callable[[str], int]): 長さの計算関数。デフォルトはtiktokenのトークン数。
+
+    Yields:
+        DocumentChunk: チャンク
+    """
+    if chunk_overlap > chunk_size:
+        raise ValueError(
+            f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})."
+        )
+    if length_function is None:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("gpt2")
+
+        def length_function(text: str) -> int:
+            return len(encoding.encode(text))
+
+    separator_length = length_function(separator)
+    current: Deque[Tuple[TextBlock, int]] = deque()
+    total = 0
+
+    def create_chunk() -> Optional[DocumentChunk]:
+        content = separator.join(block.text for block, _ in current).strip()
+        if content == "":
+            return None
+        first = current[0][0]
+        return DocumentChunk(content=content, page=first.page, section=first.section)
+
+    def split_blocks() -> Iterator[Tuple[TextBlock, int]]:
+        for block in blocks:
+            length = length_function(block.text)
+            if length <= chunk_size:
+                yield block, length
+                continue
+            for text in _split_text(
+                block.text, chunk_size, length_function, BLOCK_SEPARATORS
+            ):
+                yield TextBlock(
+                    text=text, page=block.page, section=block.section
+                ), length_function(text)
+
+    for block, length in split_blocks():
+        joined_length = separator_length if len(current) > 0 else 0
+        if len(current) > 0 and total + length + joined_length > chunk_size:
+            chunk = create_chunk()
+            if chunk is not None:
+                yield chunk
+            # オーバーラップ分の段落だけを残す
+            while total > chunk_overlap or (
+                total + length + (separator_length if len(current) > 0 else 0)
+                > chunk_size
+                and total > 0
+            ):
+                _, removed = current.popleft()
+                total -= removed + (separator_length if len(current) > 0 else 0)
+        current.append((block, length))
+        total += length + (separator_length if len(current) > 1 else 0)
+    if len(current) > 0:
+        chunk = create_chunk()
+        if chunk is not None:
+            yield chunk
+
+
+def load_document_chunks(
+    file_path: str, chunk_size: int = 512, chunk_overlap: int = 128
+) -> Iterator[DocumentChunk]:
+    """
+    ファイルを逐次的に読み込み、チャンクに分割して返す
+
+    Args:
+        file_path(str): ファイルパス
+        chunk_size(int): チャンクサイズ
+        chunk_overlap(int): チャンクのオーバーラップ
+
+    Yields:
+        DocumentChunk: チャンク
+    """
+    parser = get_parser(file_path)
+    yield from chunk_blocks(
+        parser.parse(file_path), chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+def _chunk_worker(
+    file_path: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    output: multiprocessing.Queue,
+) -> None:
+    """
+    ワーカープロセスでチャンクを作成し、キューに送る
+    """
+    try:
+        for chunk in load_document_chunks(
+            file_path=file_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        ):
+            output.put(("chunk", chunk))
+    except Exception as e:
+        output.put(("error", f"{type(e).__name__}: {str(e)}"))
+        return
+    output.put(("end", None))
+
+
+def iter_document_chunks(
+    file_path: str,
+    chunk_size: int = 512,
+    chunk_overlap: int = 128,
+    use_worker: bool = True,
+    queue_size: int = 64,
+) -> Iterator[DocumentChunk]:
+    """
+    ファイルをチャンクに分割して返す。
+    use_workerがTrueの場合は別プロセスでパースを行い、アップロードと並行して処理する。
+    キューの長さを制限しているため、ファイルサイズによらずメモリ使用量は一定となる。
+
+    Args:
+        file_path(str): ファイルパス
+        chunk_size(int): チャンクサイズ
+        chunk_overlap(int): チャンクのオーバーラップ
+        use_worker(bool): ワーカープロセスを使うかどうか
+        queue_size(int): ワーカーから受け取るチャンクのキューの最大長
+
+    Yields:
+        DocumentChunk: チャンク
+    """
+    if not use_worker:
+        yield from load_document_chunks(
+            file_path=file_path, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        return
+    # 未対応の拡張子はワーカー起動前にエラーにする
+    get_parser(file_path)
+    output: multiprocessing.Queue = multiprocessing.Queue(maxsize=queue_size)
+    process = multiprocessing.Process(
+        target=_chunk_worker,
+        args=(file_path, chunk_size, chunk_overlap, output),
+        daemon=True,
+    )
+    process.start()
+    try:
+        while True:
+            try:
+                kind, item = output.get(timeout=1.0)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                try:
+                    kind, item = output.get_nowait()
+                except queue.Empty:
+                    raise RuntimeError(
+                        f"Parser worker for {file_path} exited unexpectedly (exitcode: {process.exitcode})"
+                    )
+            if kind == "end":
+                break
+            if kind == "error":
+                raise RuntimeError(f"Failed to parse {file_path}: {item}")
+            yield item
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# text-embedding-3-largeの次元数
+DEFAULT_DIMENSIONS = 3072
+
+
+@dataclass
+class IndexProfile:
+    """
+    コレクション作成時のベクトルインデックスの設定
+    """
+
+    # "hnsw"もしくは"flat"
+    index_type: str = "hnsw"
+    # 検索時の探索リストのサイズ。-1の場合は自動
+    ef: int = -1
+    # インデックス作成時の探索リストのサイズ
+    ef_construction: int = 128
+    # 各ノードの最大接続数
+    max_connections: int = 32
+    # ベクトルの圧縮方式。None、"pq"、"bq"、"sq"のいずれか
+    quantizer: Optional[str] = None
+    # 埋め込みの次元数。Noneの場合はモデルのデフォルト(3072)
+    dimensions: Optional[int] = None
+    # 直積量子化、スカラー量子化の学習を開始するオブジェクト数。
+    # オブジェクト数がこの値に達するまでベクトルは圧縮されない。
+    # 学習はWeaviateの非同期インデックス(ASYNC_INDEXING)が有効な場合のみ行われる。
+    training_limit: int = 100000
+
+    def is_compressed(self, object_count: int) -> bool:
+        """
+        オブジェクト数に対してベクトルが圧縮されるか確認
+
+        Args:
+            object_count(int): オブジェクト数
+
+        Returns:
+            bool: 圧縮される場合True
+        """
+        if self.quantizer is None:
+            return False
+        if self.quantizer in ("pq", "sq"):
+            return object_count >= self.training_limit
+        return True
+
+    def estimate_memory(self, object_count: int) -> int:
+        """
+        インデックスが常駐するメモリ量の概算を計算する
+        直積量子化、スカラー量子化は学習前(training_limit未満)の場合、未圧縮として計算する。
+
+        Args:
+            object_count(int): オブジェクト数
+
+        Returns:
+            int: メモリ量の概算[byte]
+        """
+        dimensions = self.dimensions or DEFAULT_DIMENSIONS
+        compressed = self.is_compressed(object_count)
+        # 1ベクトルあたりのメモリ上のサイズ
+        vector_bytes = {
+            None: dimensions * 4,
+            "sq": dimensions,
+            "pq": dimensions // 4,
+            "bq": dimensions // 8,
+        }[self.quantizer if compressed else None]
+        if self.index_type == "flat":
+            # flatインデックスは未圧縮のベクトルをディスクから読むため、圧縮したベクトルのみが常駐する
+            return object_count * vector_bytes if compressed else 0
+        # 最下層のグラフはmax_connectionsの2倍の接続(各8byte)を持つ
+        graph_bytes = self.max_connections * 2 * 8
+        return object_count * (vector_bytes + graph_bytes)
+
+
+# 用途ごとのインデックス設定
+INDEX_PROFILES = {
+    # Weaviateのデフォルト設定
+    "default": IndexProfile(),
+    # 接続数を減らし、グラフのメモリを削減
+    "hnsw_small": IndexProfile(ef=64, ef_construction=64, max_connections=16),
+    # 直積量子化でベクトルを約1/16に圧縮。training_limit以上のオブジェクト数で有効
+    "hnsw_pq": IndexProfile(quantizer="pq"),
+    # スカラー量子化でベクトルを1/4に圧縮。training_limit以上のオブジェクト数で有効
+    "hnsw_sq": IndexProfile(quantizer="sq"),
+    # バイナリ量子化でベクトルを1/32に圧縮。次元数が多い埋め込みで有効
+    "hnsw_bq": IndexProfile(quantizer="bq"),
+    # 小規模なコレクション向け。グラフを作らず全件探索する
+    "flat": IndexProfile(index_type="flat"),
+    "flat_bq": IndexProfile(index_type="flat", quantizer="bq"),
+    # エッジ端末向け。次元数を1024に減らし、接続数の削減と直積量子化を併用
+    # 直積量子化はtraining_limit以上のオブジェクト数で有効。それ未満では次元数と接続数の削減のみ
+    "edge": IndexProfile(
+        ef=64,
+        ef_construction=64,
+        max_connections=16,
+        quantizer="pq",
+        dimensions=1024,
+    ),
+}
+
+
+def get_index_profile(name: str) -> IndexProfile:
+    """
+    名前からインデックス設定を取得
+
+    Args:
+        name(str): INDEX_PROFILESのキー
+
+    Returns:
+        IndexProfile: インデックス設定
+    """
+    if name not in INDEX_PROFILES:
+        raise ValueError(
+            f"Unknown index profile: {name}. Available: {list(INDEX_PROFILES.keys())}"
+        )
+    return INDEX_PROFILES[name]
+
+
+def create_vector_index_config(profile: IndexProfile) -> Any:
+    """
+    インデックス設定からWeaviateのvector_index_configを作成する
+
+    Args:
+        profile(IndexProfile): インデックス設定
+
+    Returns:
+        Any: collections.create()に渡すvector_index_config
+    """
+    from weaviate.classes.config import Configure
+
+    quantizer = None
+    if profile.quantizer == "pq":
+        quantizer = Configure.VectorIndex.Quantizer.pq(
+            training_limit=profile.training_limit
+        )
+    elif profile.quantizer == "bq":
+        quantizer = Configure.VectorIndex.Quantizer.bq()
+    elif profile.quantizer == "sq":
+        quantizer = Configure.VectorIndex.Quantizer.sq(
+            training_limit=profile.training_limit
+        )
+    elif profile.quantizer is not None:
+        raise ValueError(f"Unknown quantizer: {profile.quantizer}")
+    if profile.index_type == "flat":
+        if profile.quantizer not in (None, "bq"):
+            raise ValueError("Flat index supports only bq quantizer.")
+        return Configure.VectorIndex.flat(quantizer=quantizer)
+    if profile.index_type != "hnsw":
+        raise ValueError(f"Unknown index type: {profile.index_type}")
+    return Configure.VectorIndex.hnsw(
+        ef=profile.ef,
+        ef_construction=profile.ef_construction,
+        max_connections=profile.max_connections,
+        quantizer=quantizer,
+    )
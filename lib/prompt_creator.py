@@ -1,22 +1,10 @@
-def system_prompt_creator(context: str) -> str:
-    """
-    システムプロンプトを生成する
-
-    Args:
-        context(str): RAGから得たコンテキスト
-
-    Returns:
-        str: システムプロンプト
-    """
-
-    base_prompt = f"""
-        # DBから得た知識
-        <検索結果>
-        {context}
-        </検索結果>
-
+# OpenAIのプロンプトキャッシュが有効になる、先頭の一致部分の最小トークン数
+PROMPT_CACHE_MIN_TOKENS = 1024
+# 検索結果によらず固定のシステムプロンプト。
+# 毎回同じ内容を先頭に置くことで、LLM側のプロンプトキャッシュが効くようにする。
+STATIC_SYSTEM_PROMPT = """
         #命令文
-        *DBから得た知識を元に回答すること。
+        *DBから得た知識が与えられた場合は、それを元に回答すること。
         *質問がわからないときは、説明を求めること。
         *#キャラクター設定になりきること。
         *回答は必ず3文以内、100文字以内にすること。
@@ -35,4 +23,86 @@ def system_prompt_creator(context: str) -> str:
         #性格
         *ポジティブで元気
     """
-    return base_prompt
+
+
+def static_system_prompt_creator() -> str:
+    """
+    検索結果を含まない固定のシステムプロンプトを生成する
+
+    Returns:
+        str: システムプロンプト
+    """
+    return STATIC_SYSTEM_PROMPT
+
+
+def context_prompt_creator(context: str) -> str:
+    """
+    検索結果のプロンプトを生成する
+
+    Args:
+        context(str): RAGから得たコンテキスト
+
+    Returns:
+        str: 検索結果のプロンプト。contextが空の場合は空文字。
+    """
+    if context == "":
+        return ""
+    return f"""
+        # DBから得た知識
+        <検索結果>
+        {context}
+        </検索結果>
+    """
+
+
+def user_prompt_creator(text: str, context: str) -> str:
+    """
+    検索結果をユーザーの発話の前に付けたプロンプトを生成する
+    検索結果を会話履歴の後ろに置くことで、システムプロンプトと会話履歴をキャッシュ可能にする。
+
+    Args:
+        text(str): ユーザーの発話
+        context(str): RAGから得たコンテキスト。空の場合は発話のみを返す。
+
+    Returns:
+        str: ユーザーのプロンプト
+    """
+    if context == "":
+        return text
+    return f"""{context_prompt_creator(context)}
+        # 質問
+        {text}
+    """
+
+
+def system_prompt_creator(context: str) -> str:
+    """
+    システムプロンプトを生成する
+
+    Args:
+        context(str): RAGから得たコンテキスト。空の場合は検索結果の項目を含めない。
+
+    Returns:
+        str: システムプロンプト
+    """
+    return static_system_prompt_creator() + context_prompt_creator(context)
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """
+    テキストのトークン数を計算する
+
+    Args:
+        text(str): テキスト
+        model(str): モデル名。tiktokenが対応していないモデルはo200k_baseで計算する。
+
+    Returns:
+        int: トークン数
+    """
+    import tiktoken
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return len(encoding.encode(text))
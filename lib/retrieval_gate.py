@@ -0,0 +1,103 @@
+import re
+import threading
+from typing import Dict, Optional
+
+# 検索が不要な雑談・相槌のパターン(記号を除去した発話全体と一致した場合に検索をスキップ)
+CHITCHAT_PATTERNS = [
+    r"(こんにち|こんばん)(は|わ)",
+    r"おはよう(ございます)?",
+    r"(はじめまして|よろしく(お願いします|おねがいします)?)",
+    r"(ありがとう|ありがと|サンキュー)(ございます|ございました)?",
+    r"(どうも|すみません|ごめんなさい|ごめん)",
+    r"(さようなら|さよなら|バイバイ|またね|おやすみ(なさい)?)",
+    r"(はい|いいえ|うん|ううん|ええ|そう|そうなんだ|そうなんですね|そうですか|なるほど|了解|わかった|わかりました|オッケー|OK|ok)",
+    r"(すごい|すごいね|いいね|かわいい|えらい|へえ|ふーん|ほんと|本当)",
+]
+# 正規化時に除去する記号
+STRIP_PATTERN = r"[\s。、，,．.！!～~…・「」『』()（）]"
+
+
+class RetrievalGate(object):
+    """
+    発話ごとにWeaviateでの検索が必要かを判定し、関連する文書がない場合は検索結果を使わない
+    """
+
+    def __init__(
+        self, max_distance: Optional[float] = None, min_length: int = 2
+    ) -> None:
+        """
+        コンストラクタ
+
+        Args:
+            max_distance(float): 検索結果を使う最大のベクトル距離(コサイン距離)。
+                最も近いオブジェクトの距離がこの値を超える場合は検索結果を使わない。Noneの場合は判定しない。
+                ハイブリッド検索のスコアはクエリごとに正規化されるため、関連度の判定には使わない。
+            min_length(int): 検索を行う最小の文字数(記号を除く)
+        """
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self.chitchat_pattern = re.compile(
+            "^(" + "|".join(CHITCHAT_PATTERNS) + ")+(です|ですね|ね|よ|な)?$"
+        )
+        self.strip_pattern = re.compile(STRIP_PATTERN)
+        self.metrics = {
+            "skipped_short": 0,
+            "skipped_chitchat": 0,
+            "searched": 0,
+            "over_max_distance": 0,
+            "context_used": 0,
+        }
+        self.lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self.lock:
+            self.metrics[key] += 1
+
+    def needs_retrieval(self, text: str) -> bool:
+        """
+        発話に対して検索が必要か判定する
+        短すぎる発話と、挨拶や相槌のみの発話は検索しない。それ以外は検索する。
+
+        Args:
+            text(str): ユーザーの発話
+
+        Returns:
+            bool: 検索が必要な場合True
+        """
+        normalized = self.strip_pattern.sub("", text)
+        if len(normalized) < self.min_length:
+            self._count("skipped_short")
+            return False
+        if self.chitchat_pattern.match(normalized) is not None:
+            self._count("skipped_chitchat")
+            return False
+        self._count("searched")
+        return True
+
+    def is_relevant(self, distance: Optional[float]) -> bool:
+        """
+        最も近いオブジェクトのベクトル距離から、検索結果を使うか判定する
+
+        Args:
+            distance(float): vector_search()で取得した最も近いオブジェクトの距離。オブジェクトがない場合はNone。
+
+        Returns:
+            bool: 検索結果を使う場合True
+        """
+        if self.max_distance is not None and (
+            distance is None or distance > self.max_distance
+        ):
+            self._count("over_max_distance")
+            return False
+        self._count("context_used")
+        return True
+
+    def get_metrics(self) -> Dict[str, int]:
+        """
+        判定結果の回数を取得
+
+        Returns:
+            Dict[str, int]: 判定結果ごとの回数
+        """
+        with self.lock:
+            return dict(self.metrics)
@@ -0,0 +1,140 @@
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+
+class UploadCheckpoint(object):
+    """
+    アップロードの進捗を記録し、中断後に完了済みのファイルをスキップするためのチェックポイント
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        コンストラクタ
+
+        Args:
+            path(str): チェックポイントファイル(JSON)のパス。存在する場合は読み込む。
+        """
+        self.path = path
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.completed = json.load(f).get("completed", {})
+
+    def _prefix(self, collection_name: str, tenant: Optional[str] = None) -> str:
+        if tenant is None:
+            return f"{collection_name.capitalize()}:"
+        return f"{collection_name.capitalize()}/{tenant}:"
+
+    def _key(
+        self, collection_name: str, file_path: str, tenant: Optional[str] = None
+    ) -> str:
+        return f"{self._prefix(collection_name, tenant)}{os.path.abspath(file_path)}"
+
+    def _stat(self, file_path: str) -> Dict[str, Any]:
+        stat = os.stat(file_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def is_completed(
+        self, collection_name: str, file_path: str, tenant: Optional[str] = None
+    ) -> bool:
+        """
+        ファイルがアップロード済みか確認。ファイルが更新されている場合は未完了とみなす。
+
+        Args:
+            collection_name(str): コレクション名
+            file_path(str): ファイルパス
+            tenant(str): テナント名
+
+        Returns:
+            bool: アップロード済みの場合True
+        """
+        entry = self.completed.get(self._key(collection_name, file_path, tenant))
+        if entry is None:
+            return False
+        stat = self._stat(file_path)
+        return entry["size"] == stat["size"] and entry["mtime"] == stat["mtime"]
+
+    def mark_completed(
+        self,
+        collection_name: str,
+        file_path: str,
+        chunk_count: int,
+        tenant: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> None:
+        """
+        ファイルのアップロード完了を記録し、チェックポイントファイルを保存
+
+        Args:
+            collection_name(str): コレクション名
+            file_path(str): ファイルパス
+            chunk_count(int): アップロードしたチャンク数
+            tenant(str): テナント名
+            source(str): Weaviateに登録したソース名
+        """
+        entry = self._stat(file_path)
+        entry["chunks"] = chunk_count
+        if source is not None:
+            entry["source"] = source
+        entry["date"] = datetime.now(timezone.utc).isoformat("T")
+        self.completed[self._key(collection_name, file_path, tenant)] = entry
+        self.save()
+
+    def invalidate_source(
+        self, collection_name: str, source: str, tenant: Optional[str] = None
+    ) -> bool:
+        """
+        ソース名が一致するファイルの完了記録を削除し、次回の実行で再アップロードされるようにする
+
+        Args:
+            collection_name(str): コレクション名
+            source(str): Weaviateに登録したソース名
+            tenant(str): テナント名
+
+        Returns:
+            bool: 完了記録を削除した場合True
+        """
+        prefix = self._prefix(collection_name, tenant)
+        keys = [
+            key
+            for key, value in self.completed.items()
+            if key.startswith(prefix) and value.get("source") == source
+        ]
+        for key in keys:
+            del self.completed[key]
+        if len(keys) > 0:
+            self.save()
+        return len(keys) > 0
+
+    def reset(self, collection_name: str, tenant: Optional[str] = None) -> None:
+        """
+        コレクションの進捗を削除
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名。Noneの場合はコレクション内の全てのテナントの進捗も削除する。
+        """
+        if tenant is None:
+            prefixes = (
+                self._prefix(collection_name),
+                f"{collection_name.capitalize()}/",
+            )
+        else:
+            prefixes = (self._prefix(collection_name, tenant),)
+        self.completed = {
+            key: value
+            for key, value in self.completed.items()
+            if not key.startswith(prefixes)
+        }
+        self.save()
+
+    def save(self) -> None:
+        """
+        チェックポイントファイルを保存。書き込み途中で中断しても壊れないよう、一時ファイルから置き換える。
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"completed": self.completed}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
@@ -1,13 +1,31 @@
+import json
 import os
+import time
+from collections import deque
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Union
+from uuid import UUID
 
 import weaviate
-import weaviate.classes as wvc
-from langchain.text_splitter import CharacterTextSplitter
-from weaviate.classes.query import Rerank
+from weaviate.classes.config import Configure, DataType, Property, Tokenization
+from weaviate.classes.query import Filter, MetadataQuery, Rerank
+from weaviate.util import generate_uuid5
 
+from .chunk_dedup import ChunkDedupIndex
 from .conf import COHERE_APIKEY, OPENAI_APIKEY
+from .document_loader import DocumentChunk, is_supported_file, iter_document_chunks
+from .index_profile import (
+    DEFAULT_DIMENSIONS,
+    create_vector_index_config,
+    get_index_profile,
+)
+from .upload_checkpoint import UploadCheckpoint
+
+# スナップショットファイルのフォーマットバージョン
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DTYPES = ("float16", "float32")
+# スナップショットの書き出し時に、ベクトルをまとめて確保する行数
+SNAPSHOT_BLOCK_SIZE = 1024
 
 
 class WeaviateRagController(object):
@@ -79,74 +97,294 @@ class WeaviateRagController(object):
         except weaviate.exceptions.WeaviateCollectionDoesNotExist:
             return False
 
-    def remove_object_by_uuid(self, collection_name: str, uuid: str) -> None:
+    def _get_collection(
+        self, collection_name: str, tenant: Optional[str] = None
+    ) -> Any:
+        """
+        コレクションを取得。テナントを指定した場合は、そのテナントのデータのみを扱うコレクションを返す
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名。Noneの場合はテナントを指定しない。
+
+        Returns:
+            Any: コレクション
+        """
+        collection = self.client.collections.get(collection_name.capitalize())
+        if tenant is not None:
+            collection = collection.with_tenant(tenant)
+        return collection
+
+    def is_multi_tenancy_enabled(self, collection_name: str) -> bool:
+        """
+        コレクションでマルチテナンシーが有効か確認
+
+        Args:
+            collection_name(str): コレクション名
+
+        Returns:
+            bool: マルチテナンシーが有効な場合True
+        """
+        collection = self._get_collection(collection_name)
+        return collection.config.get().multi_tenancy_config.enabled
+
+    def get_tenants(self, collection_name: str) -> Dict[str, str]:
+        """
+        コレクションのテナントの一覧を取得
+
+        Args:
+            collection_name(str): コレクション名
+
+        Returns:
+            Dict[str, str]: テナント名と状態(ACTIVE、INACTIVE、OFFLOADEDなど)
+        """
+        collection = self._get_collection(collection_name)
+        return {
+            name: tenant.activity_status.value
+            for name, tenant in collection.tenants.get().items()
+        }
+
+    def get_tenant_status(self, collection_name: str, tenant: str) -> str:
+        """
+        テナントの状態を取得
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名
+
+        Returns:
+            str: テナントの状態(ACTIVE、INACTIVE、OFFLOADEDなど)
+
+        Raises:
+            ValueError: コレクションがない、マルチテナンシーが無効、もしくはテナントがない場合
+        """
+        collection_name = collection_name.capitalize()
+        if not self.check_collection_available(collection_name):
+            raise ValueError(f"Collection {collection_name} does not exist.")
+        if not self.is_multi_tenancy_enabled(collection_name):
+            raise ValueError(
+                f"Multi-tenancy is not enabled in collection {collection_name}, but tenant {tenant} is specified."
+            )
+        status = self.get_tenants(collection_name).get(tenant)
+        if status is None:
+            raise ValueError(
+                f"Tenant {tenant} does not exist in collection {collection_name}."
+            )
+        return status
+
+    def ensure_tenant_exists(self, collection_name: str, tenant: str) -> None:
+        """
+        テナントが存在しない場合は作成し、非アクティブな場合はアクティブにする
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名
+        """
+        from weaviate.classes.tenants import Tenant
+
+        if not self.is_multi_tenancy_enabled(collection_name):
+            raise ValueError(
+                f"Multi-tenancy is not enabled in collection {collection_name.capitalize()}."
+            )
+        status = self.get_tenants(collection_name).get(tenant)
+        if status is None:
+            print(f"Creating tenant: {tenant}")
+            self._get_collection(collection_name).tenants.create([Tenant(name=tenant)])
+        elif status != "ACTIVE":
+            self.activate_tenant(collection_name=collection_name, tenant=tenant)
+
+    def remove_tenant(self, collection_name: str, tenant: str) -> None:
+        """
+        テナントをデータごと削除
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名
+        """
+        print(f"Removing tenant: {tenant}")
+        self._get_collection(collection_name).tenants.remove([tenant])
+
+    def _update_tenant_status(
+        self, collection_name: str, tenant: str, status: Any
+    ) -> None:
+        from weaviate.classes.tenants import Tenant
+
+        # 存在しないテナントではWeaviateのエラーではなく、原因が分かるエラーにする
+        self.get_tenant_status(collection_name, tenant)
+        self._get_collection(collection_name).tenants.update(
+            [Tenant(name=tenant, activity_status=status)]
+        )
+
+    def activate_tenant(self, collection_name: str, tenant: str) -> None:
+        """
+        テナントをアクティブにし、検索や書き込みができる状態にする
+        OFFLOADEDのテナントはクラウドストレージから読み戻すため、完了まで時間がかかる。
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名
+        """
+        from weaviate.classes.tenants import TenantActivityStatus
+
+        print(f"Activating tenant: {tenant}")
+        self._update_tenant_status(collection_name, tenant, TenantActivityStatus.ACTIVE)
+
+    def deactivate_tenant(
+        self, collection_name: str, tenant: str, offload: bool = False
+    ) -> None:
+        """
+        使っていないテナントを非アクティブにし、メモリから解放する
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名
+            offload(bool): Trueの場合はデータをクラウドストレージに退避してローカルディスクからも削除する(OFFLOADED)。
+                Weaviateでoffload-s3モジュールが有効になっている必要がある。
+                Falseの場合はローカルディスクに残す(INACTIVE)。
+        """
+        from weaviate.classes.tenants import TenantActivityStatus
+
+        status = (
+            TenantActivityStatus.OFFLOADED if offload else TenantActivityStatus.INACTIVE
+        )
+        print(f"Deactivating tenant: {tenant} ({status.value})")
+        self._update_tenant_status(collection_name, tenant, status)
+
+    def remove_object_by_uuid(
+        self, collection_name: str, uuid: str, tenant: Optional[str] = None
+    ) -> None:
         """
         UUIDでオブジェクトを削除
 
         Args:
             collection_name(str): コレクション名
             uuid(str): オブジェクトのUUID
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
         """
-        collection_name = collection_name.capitalize()
-        collection = self.client.collections.get(collection_name)
+        collection = self._get_collection(collection_name, tenant)
         collection.data.delete_by_id(uuid)
         return
 
-    def ensure_collection_exists(self, collection_name) -> None:
+    def remove_objects_by_uuid(
+        self, collection_name: str, uuids: List[str], tenant: Optional[str] = None
+    ) -> None:
+        """
+        複数のオブジェクトをUUIDでまとめて削除
+
+        Args:
+            collection_name(str): コレクション名
+            uuids(List[str]): オブジェクトのUUIDリスト
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+        """
+        if len(uuids) == 0:
+            return
+        collection = self._get_collection(collection_name, tenant)
+        # 1回の削除数の上限を超えないよう分割して削除する
+        for i in range(0, len(uuids), 1000):
+            collection.data.delete_many(
+                where=Filter.by_id().contains_any(uuids[i : i + 1000])
+            )
+        return
+
+    def ensure_collection_exists(
+        self,
+        collection_name: str,
+        index_profile: str = "default",
+        multi_tenancy: bool = False,
+    ) -> None:
         """コレクションが存在しない場合は作成する
 
         Args:
             collection_name(str): コレクション名
+            index_profile(str): ベクトルインデックスの設定名(lib/index_profile.pyのINDEX_PROFILESを参照)。
+                コレクション作成時のみ反映される。デフォルトは"default"。
+            multi_tenancy(bool): マルチテナンシーを有効にするかどうか。コレクション作成時のみ反映される。
+                有効な場合、テナント(ロボットや拠点)ごとにデータとインデックスが分かれ、
+                非アクティブなテナントはメモリから解放される。
 
         """
         collection_name = collection_name.capitalize()
         if self.check_collection_available(collection_name):
             return
+        profile = get_index_profile(index_profile)
         self.client.collections.create(
             name=collection_name,
-            vectorizer_config=wvc.config.Configure.Vectorizer.text2vec_openai(
+            vectorizer_config=Configure.Vectorizer.text2vec_openai(
                 model="text-embedding-3-large",  # モデルはtext-embedding-3-largeを使用
                 vectorize_collection_name=False,  # コレクション名はベクトル化に含めない
+                dimensions=profile.dimensions,  # Noneの場合はモデルのデフォルト
             ),
-            reranker_config=wvc.config.Configure.Reranker.cohere(
-                model="rerank-multilingual-v3.0"
+            vector_index_config=create_vector_index_config(profile),
+            # 非アクティブなテナントは、アクセスされた時点で自動的にアクティブにする
+            multi_tenancy_config=(
+                Configure.multi_tenancy(enabled=True, auto_tenant_activation=True)
+                if multi_tenancy
+                else None
             ),
+            reranker_config=Configure.Reranker.cohere(model="rerank-multilingual-v3.0"),
             properties=[
-                wvc.config.Property(
+                Property(
                     name="content",
-                    data_type=wvc.config.DataType.TEXT,
+                    data_type=DataType.TEXT,
                     skip_vectorization=False,  # ベクトル化を有効
                     vectorize_property_name=False,  # プロパティ名をベクトル化に含めない
                     index_searchable=True,
                     index_filterable=False,
-                    tokenization=wvc.config.Tokenization.GSE,
+                    tokenization=Tokenization.GSE,
                 ),
-                wvc.config.Property(
+                Property(
                     name="source",
-                    data_type=wvc.config.DataType.TEXT,
+                    data_type=DataType.TEXT,
                     skip_vectorization=True,  # ベクトル化無効
                     index_searchable=False,
                     index_filterable=False,
                 ),
-                wvc.config.Property(
+                Property(
                     name="chunk_index",
-                    data_type=wvc.config.DataType.INT,  # INT型はベクトル化されない
+                    data_type=DataType.INT,  # INT型はベクトル化されない
                     skip_vectorization=True,
                 ),
-                wvc.config.Property(
+                Property(
                     name="date",
-                    data_type=wvc.config.DataType.DATE,
+                    data_type=DataType.DATE,
+                    skip_vectorization=True,
+                ),
+                Property(
+                    name="page",
+                    data_type=DataType.INT,  # PDFのページ番号
                     skip_vectorization=True,
                 ),
+                Property(
+                    name="section",
+                    data_type=DataType.TEXT,  # Markdown、HTMLの見出し
+                    skip_vectorization=True,
+                    index_searchable=False,
+                    index_filterable=False,
+                ),
             ],
         )
 
-    def get_objects(self, collection_name: str) -> list:
+    def get_vector_dimensions(self, collection_name: str) -> int:
+        """
+        コレクションのベクトライザが出力する埋め込みの次元数を取得
+
+        Args:
+            collection_name(str): コレクション名
+
+        Returns:
+            int: 次元数。ベクトライザで指定していない場合はモデルのデフォルト(3072)
+        """
+        config = self._get_collection(collection_name).config.get()
+        model = config.vectorizer_config.model if config.vectorizer_config else {}
+        return model.get("dimensions") or DEFAULT_DIMENSIONS
+
+    def get_objects(self, collection_name: str, tenant: Optional[str] = None) -> list:
         """
         コレクション内のオブジェクトを取得
 
         Args:
             collection_name(str): コレクション名
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
 
         Returns:
             list: オブジェクトのリスト
@@ -154,24 +392,71 @@ class WeaviateRagController(object):
         collection_name = collection_name.capitalize()
         if not self.check_collection_available(collection_name):
             return []
-        collection = self.client.collections.get(collection_name)
+        if tenant is not None and tenant not in self.get_tenants(collection_name):
+            return []
+        collection = self._get_collection(collection_name, tenant)
         object_list = []
         for item in collection.iterator():
             object_list.append(item)
         return object_list
 
-    def get_objects_by_source(self, collection_name: str, source: str) -> List[Any]:
+    def get_object_count(
+        self, collection_name: str, tenant: Optional[str] = None
+    ) -> int:
+        """
+        コレクション内のオブジェクト数を取得
+
+        Args:
+            collection_name(str): コレクション名
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+
+        Returns:
+            int: オブジェクト数。コレクションやテナントがない場合は0。
+        """
+        collection_name = collection_name.capitalize()
+        if not self.check_collection_available(collection_name):
+            return 0
+        if tenant is not None and tenant not in self.get_tenants(collection_name):
+            return 0
+        collection = self._get_collection(collection_name, tenant)
+        return collection.aggregate.over_all(total_count=True).total_count
+
+    def _is_dedup_index_current(
+        self,
+        dedup_index: ChunkDedupIndex,
+        collection_name: str,
+        tenant: Optional[str] = None,
+        sample_size: int = 10,
+    ) -> bool:
+        # アップローダー以外(スナップショットの読み込み、テナントやコレクションの削除など)で
+        # コレクションが変わった場合、存在しないチャンクとの重複としてチャンクが省かれないよう確認する
+        if self.get_object_count(collection_name=collection_name, tenant=tenant) != len(
+            dedup_index.entries
+        ):
+            return False
+        if len(dedup_index.entries) == 0:
+            return True
+        collection = self._get_collection(collection_name, tenant)
+        return all(
+            collection.data.exists(uuid)
+            for uuid in dedup_index.sample_uuids(sample_size)
+        )
+
+    def get_objects_by_source(
+        self, collection_name: str, source: str, tenant: Optional[str] = None
+    ) -> List[Any]:
         """
         ソース名でオブジェクトを取得
 
         Args:
             collection_name(str): コレクション名
             source(str): ソース名
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
 
         Returns:
             List[Any]: オブジェクトのリスト
         """
-        all_objects = self.get_objects(collection_name=collection_name)
+        all_objects = self.get_objects(collection_name=collection_name, tenant=tenant)
         if len(all_objects) == 0:
             return []
         objects = [obj for obj in all_objects if obj.properties["source"] == source]
@@ -184,6 +469,7 @@ class WeaviateRagController(object):
         limit: int = 3,
         alpha: float = 0.75,
         rerank: bool = False,
+        tenant: Optional[str] = None,
     ) -> str:
         """
         ハイブリッド検索を実行し、結果を返す
@@ -194,12 +480,12 @@ class WeaviateRagController(object):
             limit(int): 検索結果の最大数
             alpha(float): ハイブリッド検索の重み
             rerank(bool): rerankを行うかどうか
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
 
         Returns:
             str: 検索結果
         """
-        collection_name = collection_name.capitalize()
-        collection = self.client.collections.get(collection_name)
+        collection = self._get_collection(collection_name, tenant)
         response = ""
         if rerank:
             if not self.cohere_rerank:
@@ -209,7 +495,7 @@ class WeaviateRagController(object):
                 limit=limit,
                 alpha=alpha,
                 query_properties=["content"],
-                return_metadata=wvc.query.MetadataQuery(
+                return_metadata=MetadataQuery(
                     distance=True, certainty=True, score=True, explain_score=True
                 ),
                 rerank=Rerank(prop="content", query=text),
@@ -220,57 +506,174 @@ class WeaviateRagController(object):
                 limit=limit,
                 alpha=alpha,
                 query_properties=["content"],
-                return_metadata=wvc.query.MetadataQuery(
+                return_metadata=MetadataQuery(
                     distance=True, certainty=True, score=True, explain_score=True
                 ),
             )
         return response
 
+    def vector_search(
+        self,
+        collection_name: str,
+        text: str,
+        limit: int = 3,
+        tenant: Optional[str] = None,
+    ) -> Any:
+        """
+        ベクトル検索を実行し、オブジェクトごとのベクトル距離(コサイン距離)と合わせて返す
+        ハイブリッド検索のスコアはクエリごとに正規化されるため、関連度の判定にはこの距離を使う。
+
+        Args:
+            collection_name(str): コレクション名
+            text(str): 検索クエリ
+            limit(int): 検索結果の最大数
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+
+        Returns:
+            Any: 検索結果。距離の近い順に並び、metadata.distanceに距離が入る。
+        """
+        collection = self._get_collection(collection_name, tenant)
+        return collection.query.near_text(
+            query=text,
+            limit=limit,
+            return_metadata=MetadataQuery(distance=True),
+        )
+
+    def _add_objects(
+        self,
+        collection: Any,
+        objects: Iterable[Dict[str, Any]],
+        requests_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        retry_interval: float = 1.0,
+    ) -> List[str]:
+        """
+        オブジェクトをバッチでアップロードし、失敗したオブジェクトは間隔を空けて再送する
+
+        Args:
+            collection(Any): 書き込み先のコレクション
+            objects(Iterable[Dict[str, Any]]): batch.add_object()の引数(properties, uuid, vector)のイテレータ
+            requests_per_minute(int): 1分あたりの最大リクエスト数。Noneの場合は制限しない。
+            max_retries(int): 再送の最大回数
+            retry_interval(float): 最初の再送までの待ち時間[s]。再送ごとに2倍になる。
+
+        Returns:
+            List[str]: アップロードしたオブジェクトのUUIDリスト
+        """
+
+        def create_batch() -> Any:
+            if requests_per_minute is None:
+                return collection.batch.dynamic()
+            return collection.batch.rate_limit(requests_per_minute=requests_per_minute)
+
+        object_ids = []
+        with create_batch() as batch:
+            for obj in objects:
+                object_ids.append(batch.add_object(**obj))
+        failed_objects = collection.batch.failed_objects
+        for retry in range(max_retries):
+            if len(failed_objects) == 0:
+                break
+            interval = retry_interval * (2**retry)
+            print(
+                f"Failed to upload {len(failed_objects)} objects: {failed_objects[0].message}. "
+                f"Retry in {interval:.1f} [s] ({retry + 1}/{max_retries})"
+            )
+            time.sleep(interval)
+            with create_batch() as batch:
+                for failed in failed_objects:
+                    batch.add_object(
+                        properties=failed.object_.properties,
+                        uuid=failed.object_.uuid,
+                        vector=failed.object_.vector,
+                    )
+            failed_objects = collection.batch.failed_objects
+        if len(failed_objects) > 0:
+            raise ValueError(
+                f"Failed to upload {len(failed_objects)} objects: {[failed.message for failed in failed_objects]}"
+            )
+        return object_ids
+
     def upload_chunks(
         self,
         collection_name: str,
-        chunks: List[str],
+        chunks: Iterable[Union[str, DocumentChunk]],
         source: str = "",
         date: Optional[datetime] = None,
-    ) -> str:
+        requests_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        retry_interval: float = 1.0,
+        dedup_index: Optional[ChunkDedupIndex] = None,
+        tenant: Optional[str] = None,
+        replaced_uuids: Optional[Set[str]] = None,
+    ) -> List[str]:
         """
         チャンクをWeaviateにアップロード
 
         Args:
             collection_name(str): コレクション名
-            chunks(List[str]): チャンクリスト
+            chunks(Iterable[Union[str, DocumentChunk]]): チャンクのリストもしくはイテレータ
             source(str): ソースファイル名。デフォルトは""。
             date(datetime): 更新日時。ない場合は現在時刻がつく。デフォルトはNone。
+            requests_per_minute(int): 1分あたりの最大リクエスト数。Noneの場合は制限しない。
+            max_retries(int): 失敗したチャンクの再送の最大回数
+            retry_interval(float): 最初の再送までの待ち時間[s]。再送ごとに2倍になる。
+            dedup_index(ChunkDedupIndex): 重複検出のインデックス。指定した場合は、既存のチャンクや
+                同じソース内の前のチャンクと完全一致もしくは類似するチャンクをアップロードせず、参照として記録する。
+            tenant(str): テナント名。指定した場合はマルチテナンシーのコレクションのテナントにアップロードする。
+                コレクションやテナントが存在しない場合は作成する。
+            replaced_uuids(Set[str]): このアップロードで置き換えられる古いチャンクのUUID。重複の対象にしない。
 
         Returns:
-            str: アップロードされたチャンクのID
+            List[str]: アップロードされたチャンクのIDリスト
         """
         collection_name = collection_name.capitalize()
-        self.ensure_collection_exists(collection_name=collection_name)
-        collection = self.client.collections.get(collection_name)
-        chunk_ids = []
+        self.ensure_collection_exists(
+            collection_name=collection_name, multi_tenancy=tenant is not None
+        )
+        if tenant is not None:
+            self.ensure_tenant_exists(collection_name=collection_name, tenant=tenant)
+        collection = self._get_collection(collection_name, tenant)
         if date is None:
             date = datetime.now(timezone.utc)
-        with collection.batch.dynamic() as batch:
+
+        def create_objects() -> Iterator[Dict[str, Any]]:
             for i, chunk in enumerate(chunks):
                 # データオブジェクトの作成
+                if isinstance(chunk, str):
+                    chunk = DocumentChunk(content=chunk)
                 properties = {
-                    "content": chunk,
+                    "content": chunk.content,
                     "source": source,
                     "chunk_index": i,
                     "date": date.isoformat(("T")),
                 }
-                # オブジェクトの追加
-                try:
-                    result = batch.add_object(properties=properties)
-                    chunk_ids.append(result)
-                except Exception as e:
-                    print(f"Error uploading chunk: {str(e)}")
-        if len(collection.batch.failed_objects) > 0:
-            raise ValueError(
-                "Failed to upload some chunks: {self.collection.batch.failed_objects}"
-            )
-        return chunk_ids
+                if chunk.page is not None:
+                    properties["page"] = chunk.page
+                if chunk.section is not None:
+                    properties["section"] = chunk.section
+                # 再送しても重複しないよう、ソース名、日時、インデックスからUUIDを決める
+                uuid = generate_uuid5(f"{source}:{properties['date']}:{i}")
+                if (
+                    dedup_index is not None
+                    and dedup_index.check_and_add(
+                        uuid=uuid,
+                        content=chunk.content,
+                        source=source,
+                        replaced_uuids=replaced_uuids,
+                    )
+                    is not None
+                ):
+                    continue
+                yield {"properties": properties, "uuid": uuid}
+
+        return self._add_objects(
+            collection=collection,
+            objects=create_objects(),
+            requests_per_minute=requests_per_minute,
+            max_retries=max_retries,
+            retry_interval=retry_interval,
+        )
 
     def upload_text(
         self,
@@ -279,6 +682,7 @@ class WeaviateRagController(object):
         source: str,
         chunk_size: int = 512,
         chunk_overlap: int = 128,
+        tenant: Optional[str] = None,
     ) -> List[str]:
         """
         テキストを分割してWeaviateにアップロード
@@ -289,10 +693,14 @@ class WeaviateRagController(object):
             source(str): テキストのソース
             chunk_size(int): チャンクサイズ
             chunk_overlap(int): チャンクのオーバーラップ
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
 
         Returns:
             List[str]: アップロードされたチャンクのIDリスト
         """
+        # アップロード時のみ使うため、検索のみのプロセスでは読み込まない
+        from langchain.text_splitter import CharacterTextSplitter
+
         text_splitter = CharacterTextSplitter.from_tiktoken_encoder(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -307,10 +715,11 @@ class WeaviateRagController(object):
             chunks=chunks,
             source=source,
             date=upload_time,
+            tenant=tenant,
         )
         return result
 
-    def upload_text_file(
+    def upload_document(
         self,
         collection_name: str,
         file_path: str,
@@ -318,9 +727,18 @@ class WeaviateRagController(object):
         metadata: Optional[Dict] = None,
         chunk_size: int = 512,
         chunk_overlap: int = 128,
+        use_worker: bool = True,
+        requests_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        retry_interval: float = 1.0,
+        dedup_index: Optional[ChunkDedupIndex] = None,
+        tenant: Optional[str] = None,
     ) -> List[str]:
         """
-        ファイルを読み込んでWeaviateにアップロード
+        ファイルを逐次読み込みながら分割し、Weaviateにアップロード
+        対応形式はテキスト、Markdown、HTML、PDF(lib/document_loader.pyのPARSERSを参照)
+        同じソース名のチャンクがある場合は、新しいチャンクのアップロードが全て成功してから古いチャンクを削除する。
+        失敗した場合はアップロード途中の新しいチャンクを削除し、古いチャンクを残す。
 
         Args:
             collection_name(str): コレクション名
@@ -329,34 +747,131 @@ class WeaviateRagController(object):
             metadata(Dict): メタデータ
             chunk_size(int): チャンクサイズ
             chunk_overlap(int): チャンクのオーバーラップ
+            use_worker(bool): ファイルのパースを別プロセスで行うかどうか
+            requests_per_minute(int): 1分あたりの最大リクエスト数。Noneの場合は制限しない。
+            max_retries(int): 失敗したチャンクの再送の最大回数
+            retry_interval(float): 最初の再送までの待ち時間[s]。再送ごとに2倍になる。
+            dedup_index(ChunkDedupIndex): 重複検出のインデックス。指定した場合は重複するチャンクをアップロードしない。
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
 
         Returns:
             List[str]: アップロードされたチャンクのIDリスト
 
         """
+        file_name = self._get_source_name(file_path=file_path, parent_path=parent_path)
+        old_uuids = [
+            obj.uuid
+            for obj in self.get_objects_by_source(
+                collection_name=collection_name, source=file_name, tenant=tenant
+            )
+        ]
+        chunks = iter_document_chunks(
+            file_path=file_path,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            use_worker=use_worker,
+        )
+        replaced_uuids = {str(uuid) for uuid in old_uuids}
+        if dedup_index is not None:
+            dedup_index.remove_references(file_name)
+            # Weaviateから消えてインデックスにだけ残っているチャンクも置き換え対象にする
+            replaced_uuids |= set(dedup_index.get_uuids_by_source(file_name))
         try:
-            with open(file_path, "r", encoding="utf-8") as file:
-                text = file.read()
-                if parent_path is None:
-                    file_name = os.path.basename(file_path)
-                else:
-                    file_name = file_path.replace(parent_path, "")
-                same_source_objects = self.get_objects_by_source(
-                    collection_name=collection_name, source=file_name
+            chunk_ids = self.upload_chunks(
+                collection_name=collection_name,
+                chunks=chunks,
+                source=file_name,
+                date=datetime.now(timezone.utc),
+                requests_per_minute=requests_per_minute,
+                max_retries=max_retries,
+                retry_interval=retry_interval,
+                dedup_index=dedup_index,
+                tenant=tenant,
+                replaced_uuids=replaced_uuids,
+            )
+        except Exception:
+            # アップロード途中の新しいチャンクを削除し、古いチャンクを残す
+            old_uuid_set = set(old_uuids)
+            new_uuids = [
+                obj.uuid
+                for obj in self.get_objects_by_source(
+                    collection_name=collection_name, source=file_name, tenant=tenant
                 )
-                if len(same_source_objects) > 0:
-                    print(f"Source name: {file_name} is already uploaded. Overwrite")
-                    for obj in same_source_objects:
-                        self.remove_object_by_uuid(
-                            collection_name=collection_name, uuid=obj.uuid
-                        )
-                return self.upload_text(
-                    collection_name=collection_name,
-                    text=text,
-                    source=file_name,
-                    chunk_size=chunk_size,
-                    chunk_overlap=chunk_overlap,
+                if obj.uuid not in old_uuid_set
+            ]
+            self.remove_objects_by_uuid(
+                collection_name=collection_name, uuids=new_uuids, tenant=tenant
+            )
+            if dedup_index is not None:
+                dedup_index.rollback_replacement(
+                    [
+                        uuid
+                        for uuid in dedup_index.get_uuids_by_source(file_name)
+                        if uuid not in replaced_uuids
+                    ]
+                )
+            raise
+        if len(old_uuids) > 0:
+            print(f"Source name: {file_name} is already uploaded. Overwrite")
+            self.remove_objects_by_uuid(
+                collection_name=collection_name, uuids=old_uuids, tenant=tenant
+            )
+        if dedup_index is not None:
+            # 参照を引き継げなかったソースはpop_orphaned_sources()で取得し、upload_filesで再アップロードする
+            orphaned_sources = dedup_index.commit_replacement(
+                replaced_uuids=replaced_uuids, source=file_name
+            )
+            dedup_index.save()
+            if len(orphaned_sources) > 0:
+                print(
+                    f"Removed chunks were shared as duplicates by {sorted(orphaned_sources)}. "
+                    "They need to be re-uploaded."
                 )
+        return chunk_ids
+
+    def _get_source_name(
+        self, file_path: str, parent_path: Optional[str] = None
+    ) -> str:
+        if parent_path is None:
+            return os.path.basename(file_path)
+        return file_path.replace(parent_path, "")
+
+    def upload_text_file(
+        self,
+        collection_name: str,
+        file_path: str,
+        parent_path: Optional[str] = None,
+        metadata: Optional[Dict] = None,
+        chunk_size: int = 512,
+        chunk_overlap: int = 128,
+        tenant: Optional[str] = None,
+    ) -> List[str]:
+        """
+        ファイルを読み込んでWeaviateにアップロード
+
+        Args:
+            collection_name(str): コレクション名
+            file_path(str): ファイルパス
+            parent_path(str): 親ディレクトリ。指定した場合はファイルパスから親ディレクトリを除去し、、パスをtitleに使用
+            metadata(Dict): メタデータ
+            chunk_size(int): チャンクサイズ
+            chunk_overlap(int): チャンクのオーバーラップ
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+
+        Returns:
+            List[str]: アップロードされたチャンクのIDリスト
+
+        """
+        try:
+            return self.upload_document(
+                collection_name=collection_name,
+                file_path=file_path,
+                parent_path=parent_path,
+                metadata=metadata,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                tenant=tenant,
+            )
         except Exception as e:
             print(f"Error processing {file_path}: {str(e)}")
             return []
@@ -369,6 +884,14 @@ class WeaviateRagController(object):
         metadata: Optional[Dict] = None,
         chunk_size: int = 512,
         chunk_overlap: int = 128,
+        use_worker: bool = True,
+        checkpoint_path: Optional[str] = None,
+        requests_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        retry_interval: float = 1.0,
+        dedup_index_path: Optional[str] = None,
+        dedup_threshold: float = 0.8,
+        tenant: Optional[str] = None,
     ) -> Dict[str, List[str]]:
         """
         複数のファイルをアップロード
@@ -380,21 +903,293 @@ class WeaviateRagController(object):
             metadata(Dict): メタデータ
             chunk_size(int): チャンクサイズ
             chunk_overlap(int): チャンクのオーバーラップ
+            use_worker(bool): ファイルのパースを別プロセスで行うかどうか
+            checkpoint_path(str): チェックポイントファイルのパス。指定した場合は完了したファイルを記録し、
+                再実行時に完了済みで更新のないファイルをスキップする。
+            requests_per_minute(int): 1分あたりの最大リクエスト数。Noneの場合は制限しない。
+            max_retries(int): 失敗したチャンクの再送の最大回数
+            retry_interval(float): 最初の再送までの待ち時間[s]。再送ごとに2倍になる。
+            dedup_index_path(str): 重複検出のインデックスファイルのパス。指定した場合は、コレクション内の
+                他のソースのチャンクと重複するチャンクをアップロードしない。ファイルがない場合や、オブジェクト数などがコレクションと一致しない場合は既存のオブジェクトから作成する。
+                重複先のチャンクが削除されたソースは、今回のファイルリストにあれば再アップロードし、
+                ない場合はチェックポイントの完了記録を削除して次回の実行で再アップロードされるようにする。
+            dedup_threshold(float): 類似とみなす推定Jaccard係数の下限
+            tenant(str): テナント名。指定した場合はマルチテナンシーのコレクションのテナントにアップロードする。
+                チェックポイントと重複検出はテナントごとに扱う。
 
         Returns:
             Dict[str, List[str]]: アップロードされたファイルとチャンクIDのリスト
         """
         results = {}
-        for file_path in file_paths:
-            if file_path.endswith(".txt"):
-                chunk_ids = self.upload_text_file(
+        checkpoint = None
+        if checkpoint_path is not None:
+            checkpoint = UploadCheckpoint(checkpoint_path)
+        dedup_index = None
+        if dedup_index_path is not None:
+            dedup_index = ChunkDedupIndex(
+                path=dedup_index_path,
+                collection_name=collection_name,
+                threshold=dedup_threshold,
+                tenant=tenant,
+            )
+            rebuild = not dedup_index.loaded
+            if rebuild:
+                print(f"Building dedup index from {collection_name}")
+            elif not self._is_dedup_index_current(
+                dedup_index=dedup_index, collection_name=collection_name, tenant=tenant
+            ):
+                print(
+                    f"Dedup index {dedup_index_path} does not match {collection_name}. Rebuilding"
+                )
+                rebuild = True
+            if rebuild:
+                dedup_index.build(
+                    self.get_objects(collection_name=collection_name, tenant=tenant)
+                )
+                dedup_index.save()
+        source_paths = {
+            self._get_source_name(
+                file_path=file_path, parent_path=parent_path
+            ): file_path
+            for file_path in file_paths
+        }
+        pending = deque(file_paths)
+        processed: Set[str] = set()
+        requeued: Set[str] = set()
+
+        def requeue_orphaned_sources() -> None:
+            for source in sorted(dedup_index.pop_orphaned_sources()):
+                # 重複として省いたチャンクが削除されたため、ソースを再アップロードする
+                if checkpoint is not None:
+                    checkpoint.invalidate_source(
+                        collection_name=collection_name, source=source, tenant=tenant
+                    )
+                source_path = source_paths.get(source)
+                if source_path is None or source_path in requeued:
+                    print(
+                        f"Source name: {source} lost shared duplicate chunks. "
+                        "Re-upload it to restore them."
+                    )
+                elif source_path in processed:
+                    print(
+                        f"Re-upload {source_path}: shared duplicate chunks were removed"
+                    )
+                    requeued.add(source_path)
+                    pending.append(source_path)
+
+        if dedup_index is not None:
+            requeue_orphaned_sources()
+        while len(pending) > 0:
+            file_path = pending.popleft()
+            processed.add(file_path)
+            if not is_supported_file(file_path):
+                print(f"Skip unsupported file: {file_path}")
+                continue
+            if checkpoint is not None and checkpoint.is_completed(
+                collection_name=collection_name, file_path=file_path, tenant=tenant
+            ):
+                print(f"Skip completed file: {file_path}")
+                continue
+            try:
+                chunk_ids = self.upload_document(
                     collection_name=collection_name,
                     file_path=file_path,
                     parent_path=parent_path,
                     metadata=metadata,
                     chunk_size=chunk_size,
                     chunk_overlap=chunk_overlap,
+                    use_worker=use_worker,
+                    requests_per_minute=requests_per_minute,
+                    max_retries=max_retries,
+                    retry_interval=retry_interval,
+                    dedup_index=dedup_index,
+                    tenant=tenant,
+                )
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
+                results[file_path] = []
+                continue
+            if checkpoint is not None:
+                checkpoint.mark_completed(
+                    collection_name=collection_name,
+                    file_path=file_path,
+                    chunk_count=len(chunk_ids),
+                    tenant=tenant,
+                    source=self._get_source_name(
+                        file_path=file_path, parent_path=parent_path
+                    ),
                 )
-                results[file_path] = chunk_ids
-                print(f"Uploaded {file_path}: {len(chunk_ids)} chunks")
+            results[file_path] = chunk_ids
+            print(f"Uploaded {file_path}: {len(chunk_ids)} chunks")
+            if dedup_index is not None:
+                requeue_orphaned_sources()
+        if dedup_index is not None:
+            stats = dedup_index.get_stats()
+            print(
+                f"Dedup: {stats['total']} chunks, {stats['exact']} exact, {stats['near']} near duplicates "
+                f"(dedup ratio: {stats['dedup_ratio']:.1%})"
+            )
         return results
+
+    def export_collection(
+        self,
+        collection_name: str,
+        file_path: str,
+        dtype: str = "float16",
+        tenant: Optional[str] = None,
+    ) -> int:
+        """
+        コレクションのプロパティとベクトルをスナップショットファイル(.npz)に書き出す
+        ベクトルはNumPy配列、プロパティはJSONとして1ファイルにまとめる
+
+        Args:
+            collection_name(str): コレクション名
+            file_path(str): 書き出し先のファイルパス
+            dtype(str): ベクトルの保存型。"float16"もしくは"float32"。デフォルトは"float16"。
+            tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+
+        Returns:
+            int: 書き出したオブジェクト数
+        """
+        import numpy as np
+
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f"dtype must be one of {SNAPSHOT_DTYPES}: {dtype}")
+        collection_name = collection_name.capitalize()
+        if not self.check_collection_available(collection_name):
+            raise ValueError(f"Collection {collection_name} does not exist.")
+        collection = self._get_collection(collection_name, tenant)
+        uuids = bytearray()
+        # Pythonのfloatのリストで保持するとメモリを大きく使うため、保存型の配列にブロック単位で書き込む
+        blocks: List[Any] = []
+        block_rows = 0
+        properties_list = []
+        for item in collection.iterator(include_vector=True):
+            vector = item.vector
+            if isinstance(vector, dict):
+                vector = vector.get("default")
+            if vector is None:
+                print(f"Skip object without vector: {item.uuid}")
+                continue
+            properties = {}
+            for key, value in item.properties.items():
+                if isinstance(value, datetime):
+                    value = value.isoformat("T")
+                properties[key] = value
+            if len(blocks) == 0 or block_rows == SNAPSHOT_BLOCK_SIZE:
+                blocks.append(np.empty((SNAPSHOT_BLOCK_SIZE, len(vector)), dtype=dtype))
+                block_rows = 0
+            blocks[-1][block_rows] = vector
+            block_rows += 1
+            uuids.extend(item.uuid.bytes)
+            properties_list.append(properties)
+        if len(blocks) == 0:
+            # 空のコレクションやテナントも、読み込み可能なスナップショットとして書き出す
+            vectors = np.empty((0, 0), dtype=dtype)
+        else:
+            blocks[-1] = blocks[-1][:block_rows]
+            vectors = np.concatenate(blocks) if len(blocks) > 1 else blocks[0]
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "collection": collection_name,
+            "tenant": tenant,
+            "count": len(vectors),
+            "dimensions": vectors.shape[1],
+            "dtype": dtype,
+        }
+        np.savez(
+            file_path,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            uuids=np.frombuffer(bytes(uuids), dtype=np.uint8).reshape(-1, 16),
+            vectors=vectors,
+            properties=np.frombuffer(
+                json.dumps(properties_list, ensure_ascii=False).encode("utf-8"),
+                dtype=np.uint8,
+            ),
+        )
+        print(f"Exported {len(vectors)} objects from {collection_name} to {file_path}")
+        return len(vectors)
+
+    def import_collection(
+        self,
+        collection_name: str,
+        file_path: str,
+        remove: bool = False,
+        index_profile: str = "default",
+        tenant: Optional[str] = None,
+    ) -> int:
+        """
+        スナップショットファイル(.npz)をコレクションに読み込む
+        保存済みのベクトルを使うため、埋め込みAPIは呼び出さない
+
+        Args:
+            collection_name(str): 読み込み先のコレクション名
+            file_path(str): スナップショットのファイルパス
+            remove(bool): 読み込み前に既存のコレクションを削除するかどうか。テナントを指定した場合はテナントを削除する。
+            index_profile(str): コレクションを作成する場合のベクトルインデックスの設定名
+            tenant(str): 読み込み先のテナント名。指定した場合はマルチテナンシーのコレクションのテナントに読み込む。
+
+        Returns:
+            int: 読み込んだオブジェクト数
+        """
+        import numpy as np
+
+        with np.load(file_path, allow_pickle=False) as snapshot:
+            meta = json.loads(snapshot["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version: {meta.get('version')}")
+            uuids = snapshot["uuids"]
+            vectors = snapshot["vectors"].astype(np.float32)
+            properties_list = json.loads(
+                snapshot["properties"].tobytes().decode("utf-8")
+            )
+        collection_name = collection_name.capitalize()
+        # 検索時の埋め込みと次元数が一致しないと検索できないため、コレクションを変更する前に確認する
+        dimensions = meta.get("dimensions", 0)
+        if dimensions > 0:
+            if self.check_collection_available(collection_name) and not (
+                remove and tenant is None
+            ):
+                target = f"collection {collection_name}"
+                expected = self.get_vector_dimensions(collection_name)
+                hint = "Import into another collection or remove the collection first."
+            else:
+                target = f"index profile {index_profile}"
+                expected = (
+                    get_index_profile(index_profile).dimensions or DEFAULT_DIMENSIONS
+                )
+                hint = "Choose an index profile with matching dimensions."
+            if dimensions != expected:
+                raise ValueError(
+                    f"Snapshot vectors have {dimensions} dimensions, but {target} uses {expected}. {hint}"
+                )
+        if remove and self.check_collection_available(collection_name):
+            if tenant is None:
+                self.remove_collection(collection_name=collection_name)
+            elif tenant in self.get_tenants(collection_name):
+                self.remove_tenant(collection_name=collection_name, tenant=tenant)
+        self.ensure_collection_exists(
+            collection_name=collection_name,
+            index_profile=index_profile,
+            multi_tenancy=tenant is not None,
+        )
+        if tenant is not None:
+            self.ensure_tenant_exists(collection_name=collection_name, tenant=tenant)
+        collection = self._get_collection(collection_name, tenant)
+        self._add_objects(
+            collection=collection,
+            objects=(
+                {
+                    "properties": properties,
+                    "uuid": UUID(bytes=uuid_bytes.tobytes()),
+                    "vector": vector.tolist(),
+                }
+                for uuid_bytes, vector, properties in zip(
+                    uuids, vectors, properties_list
+                )
+            ),
+        )
+        print(
+            f"Imported {len(properties_list)} objects from {file_path} to {collection_name}"
+        )
+        return len(properties_list)
@@ -3,10 +3,17 @@ import copy
 import os
 import sys
 from concurrent import futures
+from typing import Optional
 
 import grpc
 from lib.akari_chatgpt_bot.lib.chat_akari_grpc import ChatStreamAkariGrpc
-from lib.prompt_creator import system_prompt_creator
+from lib.prompt_creator import (
+    PROMPT_CACHE_MIN_TOKENS,
+    count_tokens,
+    static_system_prompt_creator,
+    user_prompt_creator,
+)
+from lib.retrieval_gate import RetrievalGate
 from lib.weaviate_rag_controller import WeaviateRagController
 
 sys.path.append(
@@ -28,11 +35,15 @@ class GptServer(gpt_server_pb2_grpc.GptServerServiceServicer):
         collection_name: str,
         weaviate_host: str = "127.0.0.1",
         weaviate_port: int = 10080,
+        max_distance: Optional[float] = None,
+        tenant: Optional[str] = None,
     ) -> None:
         """
         コンストラクタ
         Args:
             collection_name (str): 検索に使うWeaviateのコレクション名
+            max_distance (float): 検索結果を使う最大のベクトル距離。Noneの場合は判定しない
+            tenant (str): マルチテナンシーのコレクションで検索に使うテナント名(ロボットや拠点のID)
         """
         self.chat_stream_akari_grpc = ChatStreamAkariGrpc()
         self.SYSTEM_PROMPT_PATH = (
@@ -49,6 +60,64 @@ class GptServer(gpt_server_pb2_grpc.GptServerServiceServicer):
             host=weaviate_host, port=weaviate_port
         )
         self.collections = collection_name
+        self.tenant = tenant
+        if self.tenant is not None:
+            # テナントの指定誤りは最初の検索ではなく起動時にエラーにする
+            status = self.weaviate_controller.get_tenant_status(
+                collection_name=self.collections, tenant=self.tenant
+            )
+            # 最初の検索でテナントの読み込みを待たないよう、起動時にアクティブにしておく
+            if status != "ACTIVE":
+                self.weaviate_controller.activate_tenant(
+                    collection_name=self.collections, tenant=self.tenant
+                )
+        self.retrieval_gate = RetrievalGate(max_distance=max_distance)
+        # 最終応答用の固定のシステムプロンプト
+        self.model = "gpt-4o"
+        self.static_system_prompt = static_system_prompt_creator()
+        self.static_system_message = self.chat_stream_akari_grpc.create_message(
+            self.static_system_prompt, role="system"
+        )
+        # トークン数は起動時にtiktokenを読み込まないよう、最初の応答の後に一度だけ計算する
+        self.static_prompt_tokens: Optional[int] = None
+        # システムプロンプトを除いた会話履歴のトークン数
+        self.history_tokens = 0
+        # トークン数の推定で応答を遅らせないよう、別スレッドで順番に計算する
+        self.token_executor = futures.ThreadPoolExecutor(max_workers=1)
+
+    def _log_prompt_tokens(self, user_prompt: str, content: str, response: str) -> None:
+        """
+        プロンプトのトークン数と、毎回同じになる先頭部分の割合の推定値を表示する
+        チャットクライアントはAPIのusage(cached_tokens)を返さないため、キャッシュの実際のヒット数ではなく
+        tiktokenによる推定値を表示する。
+
+        Args:
+            user_prompt(str): 検索結果を付けたユーザーのプロンプト
+            content(str): ユーザーの発話
+            response(str): 応答
+        """
+        try:
+            if self.static_prompt_tokens is None:
+                self.static_prompt_tokens = count_tokens(
+                    self.static_system_prompt, self.model
+                )
+            prefix_tokens = self.static_prompt_tokens + self.history_tokens
+            total_tokens = prefix_tokens + count_tokens(user_prompt, self.model)
+            cache_note = (
+                ""
+                if prefix_tokens >= PROMPT_CACHE_MIN_TOKENS
+                else f", below {PROMPT_CACHE_MIN_TOKENS} tokens required for caching"
+            )
+            print(
+                f"Estimated prompt tokens: {total_tokens} "
+                f"(stable prefix: {prefix_tokens}, {prefix_tokens / total_tokens:.0%}{cache_note})"
+            )
+            self.history_tokens += count_tokens(content, self.model) + count_tokens(
+                response, self.model
+            )
+        except Exception as e:
+            # 推定は表示のみのため、失敗しても応答には影響させない
+            print(f"Failed to estimate prompt tokens: {e}")
 
     def SetGpt(
         self, request: gpt_server_pb2.SetGptRequest(), context: grpc.ServicerContext
@@ -67,25 +136,45 @@ class GptServer(gpt_server_pb2_grpc.GptServerServiceServicer):
             self.messages = copy.deepcopy(tmp_messages)
         if is_finish:
             # 最終応答。高速生成するために、モデルはgpt-4o
-            # テキストをWeaviateで検索
-            weaviate_response = self.weaviate_controller.hybrid_search(
-                collection_name=self.collections,
-                text=content,
-                limit=3,
-                alpha=0.75,
-                rerank=False,
-            )
+            # 挨拶や相槌以外の場合のみ、テキストをWeaviateで検索
             contexts = ""
-            for p in weaviate_response.objects:
-                contexts += p.properties["content"]
-            # system_promptをWeaviateの検索結果を含んだ文に変更
-            system_prompt = system_prompt_creator(context=contexts)
-            tmp_messages[0] = self.chat_stream_akari_grpc.create_message(
-                system_prompt, role="system"
-            )
+            if self.retrieval_gate.needs_retrieval(content):
+                if self.retrieval_gate.max_distance is None:
+                    weaviate_response = self.weaviate_controller.hybrid_search(
+                        collection_name=self.collections,
+                        text=content,
+                        limit=3,
+                        alpha=0.75,
+                        rerank=False,
+                        tenant=self.tenant,
+                    )
+                    distance = None
+                else:
+                    # 埋め込みと検索を1回で済ませるため、距離の判定に使ったベクトル検索の結果をそのまま使う
+                    weaviate_response = self.weaviate_controller.vector_search(
+                        collection_name=self.collections,
+                        text=content,
+                        limit=3,
+                        tenant=self.tenant,
+                    )
+                    distance = (
+                        weaviate_response.objects[0].metadata.distance
+                        if len(weaviate_response.objects) > 0
+                        else None
+                    )
+                # 関連する文書がない場合は検索結果を使わない
+                if self.retrieval_gate.is_relevant(distance):
+                    for p in weaviate_response.objects:
+                        contexts += p.properties["content"]
+            print(f"Retrieval metrics: {self.retrieval_gate.get_metrics()}")
+            # システムプロンプトと会話履歴は毎回同じ内容にしてキャッシュを効かせ、
+            # Weaviateの検索結果は最後のユーザー発話の前に付ける
+            tmp_messages[0] = self.static_system_message
+            user_prompt = user_prompt_creator(text=content, context=contexts)
+            tmp_messages[-1] = self.chat_stream_akari_grpc.create_message(user_prompt)
             response = ""
             for sentence in self.chat_stream_akari_grpc.chat(
-                tmp_messages, model="gpt-4o"
+                tmp_messages, model=self.model
             ):
                 print(f"Send to voice server: {sentence}")
                 self.stub.SetText(voice_server_pb2.SetTextRequest(text=sentence))
@@ -95,6 +184,9 @@ class GptServer(gpt_server_pb2_grpc.GptServerServiceServicer):
             self.messages.append(
                 self.chat_stream_akari_grpc.create_message(response, role="assistant")
             )
+            self.token_executor.submit(
+                self._log_prompt_tokens, user_prompt, content, response
+            )
         else:
             # 途中での第一声とモーション準備。function_callingの確実性のため、モデルはgpt-4-turbo
             for sentence in self.chat_stream_akari_grpc.chat_and_motion(
@@ -134,6 +226,18 @@ def main() -> None:
         type=str,
         help="Weaviate collection name",
     )
+    parser.add_argument(
+        "--max_distance",
+        default=None,
+        type=float,
+        help="Max cosine distance of the nearest object to use search results as context",
+    )
+    parser.add_argument(
+        "-t",
+        "--tenant",
+        type=str,
+        help="Tenant name (e.g. robot or site ID) in a multi-tenant collection",
+    )
     args = parser.parse_args()
     server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
     gpt_server_pb2_grpc.add_GptServerServiceServicer_to_server(
@@ -141,6 +245,8 @@ def main() -> None:
             collection_name=args.collections,
             weaviate_host=args.weaviate_host,
             weaviate_port=args.weaviate_port,
+            max_distance=args.max_distance,
+            tenant=args.tenant,
         ),
         server,
     )
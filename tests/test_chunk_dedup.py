@@ -0,0 +1,100 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from lib.chunk_dedup import ChunkDedupIndex
+
+BASE = (
+    "ロボットの充電はドックに戻すことで自動的に開始されます。"
+    "充電中はランプが橙色に点灯し、完了すると緑色に変わります。"
+    "長期間使わない場合は、電源を切ってから保管してください。"
+)
+SHARED = (
+    "本製品を安全にお使いいただくため、ご使用前に必ずこの説明書をお読みください。" * 3
+)
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ChunkDedupIndex(path=str(tmp_path / "dedup.json"), collection_name="test")
+
+
+def test_exact_match_across_sources(index):
+    assert index.check_and_add("a1", SHARED, "a.md") is None
+    assert index.check_and_add("b1", SHARED, "b.md") == "a1"
+    assert index.entries["a1"]["refs"] == ["b.md"]
+    stats = index.get_stats()
+    assert (stats["exact"], stats["unique"]) == (1, 1)
+
+
+def test_exact_match_within_source(index):
+    assert index.check_and_add("a1", SHARED, "manual.pdf") is None
+    assert index.check_and_add("a2", SHARED, "manual.pdf") == "a1"
+    assert index.entries["a1"]["refs"] == []
+
+
+def test_near_match_above_threshold(index):
+    assert index.check_and_add("a1", BASE, "a.md") is None
+    near = BASE.replace("保管してください。", "保管して下さい。")
+    assert index.check_and_add("b1", near, "b.md") == "a1"
+    assert index.get_stats()["near"] == 1
+
+
+def test_near_match_below_threshold(index):
+    assert index.check_and_add("a1", BASE, "a.md") is None
+    different = (
+        BASE[: len(BASE) // 2] + "お手入れは乾いた柔らかい布で軽く拭いてください。"
+    )
+    assert index.check_and_add("b1", different, "b.md") is None
+    assert index.get_stats()["unique"] == 2
+
+
+def test_reupload_unchanged_source_keeps_refs(index):
+    index.check_and_add("a1", SHARED, "a.md")
+    index.check_and_add("b1", SHARED, "b.md")
+    replaced = set(index.get_uuids_by_source("a.md"))
+    index.remove_references("a.md")
+    assert index.check_and_add("a2", SHARED, "a.md", replaced_uuids=replaced) is None
+    assert index.commit_replacement(replaced, "a.md") == set()
+    assert list(index.entries) == ["a2"]
+    assert index.entries["a2"]["refs"] == ["b.md"]
+    assert index.pop_orphaned_sources() == set()
+
+
+def test_changed_source_orphans_referencing_source(index):
+    index.check_and_add("a1", SHARED, "a.md")
+    index.check_and_add("b1", SHARED, "b.md")
+    replaced = set(index.get_uuids_by_source("a.md"))
+    index.remove_references("a.md")
+    assert index.check_and_add("a2", BASE, "a.md", replaced_uuids=replaced) is None
+    assert index.commit_replacement(replaced, "a.md") == {"b.md"}
+    assert index.pop_orphaned_sources() == {"b.md"}
+    assert index.pop_orphaned_sources() == set()
+    # 削除されたチャンクとは重複しない
+    assert index.check_and_add("b2", SHARED, "b.md") is None
+
+
+def test_rollback_replacement_keeps_old_chunks(index):
+    index.check_and_add("a1", SHARED, "a.md")
+    index.check_and_add("b1", SHARED, "b.md")
+    replaced = set(index.get_uuids_by_source("a.md"))
+    index.check_and_add("a2", BASE, "a.md", replaced_uuids=replaced)
+    index.check_and_add("a3", SHARED, "a.md", replaced_uuids=replaced)
+    index.rollback_replacement(["a2", "a3"])
+    assert list(index.entries) == ["a1"]
+    assert index.entries["a1"]["refs"] == ["b.md"]
+    assert index.transferred == set()
+    assert index.check_and_add("c1", SHARED, "c.md") == "a1"
+
+
+def test_save_and_load(tmp_path, index):
+    index.check_and_add("a1", SHARED, "a.md")
+    index.check_and_add("b1", SHARED, "b.md")
+    index.check_and_add("a2", BASE, "a.md")
+    index.save()
+    loaded = ChunkDedupIndex(path=str(tmp_path / "dedup.json"), collection_name="test")
+    assert loaded.loaded
+    assert loaded.entries == index.entries
+    assert loaded.check_and_add("c1", BASE, "c.md") == "a2"
+    with pytest.raises(ValueError):
+        ChunkDedupIndex(path=str(tmp_path / "dedup.json"), collection_name="other")
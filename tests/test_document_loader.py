@@ -0,0 +1,85 @@
+import pytest
+
+from lib.document_loader import MarkdownParser, TextBlock, _split_text, chunk_blocks
+
+
+def chunk_texts(paragraphs, chunk_size, chunk_overlap, page=None, section=None):
+    blocks = (TextBlock(text=text, page=page, section=section) for text in paragraphs)
+    return list(
+        chunk_blocks(
+            blocks,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+        )
+    )
+
+
+def test_merge_with_overlap():
+    chunks = chunk_texts(["aaaa", "bbbb", "cccc", "dddd"], 10, 4)
+    assert [chunk.content for chunk in chunks] == [
+        "aaaa\n\nbbbb",
+        "bbbb\n\ncccc",
+        "cccc\n\ndddd",
+    ]
+
+
+def test_matches_langchain_merge():
+    text_splitters = pytest.importorskip("langchain_text_splitters")
+    paragraphs = [
+        "a" * 3,
+        "b" * 17,
+        "c" * 8,
+        "d" * 25,
+        "e" * 1,
+        "f" * 12,
+        "g" * 30,
+        "h" * 5,
+        "i" * 9,
+    ]
+    splitter = text_splitters.CharacterTextSplitter(
+        separator="\n\n", chunk_size=30, chunk_overlap=10, length_function=len
+    )
+    expected = splitter.split_text("\n\n".join(paragraphs))
+    chunks = chunk_texts(paragraphs, 30, 10)
+    assert [chunk.content for chunk in chunks] == expected
+
+
+def test_split_oversized_block_on_sentences():
+    sentence = "あ" * 30 + "。"
+    chunks = chunk_texts([sentence * 10], 100, 0, page=3, section="概要")
+    assert len(chunks) > 1
+    assert all(len(chunk.content) <= 100 for chunk in chunks)
+    assert all(chunk.page == 3 and chunk.section == "概要" for chunk in chunks)
+    assert "".join(chunk.content.replace("\n\n", "") for chunk in chunks) == (
+        sentence * 10
+    )
+
+
+def test_split_oversized_block_without_separator():
+    text = "x" * 1000
+    chunks = chunk_texts([text], 64, 0)
+    assert all(len(chunk.content) <= 64 for chunk in chunks)
+    assert "".join(chunk.content for chunk in chunks) == text
+
+
+def test_split_text_keeps_separator():
+    assert _split_text("一。二。三", 2, len, ["。"]) == ["一。", "二。", "三"]
+
+
+def test_markdown_ignores_headings_in_code_fence(tmp_path):
+    path = tmp_path / "manual.md"
+    path.write_text(
+        "# 設定\n\n```bash\n# not heading\nsudo apt install foo\n```\n\n"
+        "~~~\n## not heading either\n~~~\n\n## 使い方\n\n本文",
+        encoding="utf-8",
+    )
+    blocks = list(MarkdownParser().parse(str(path)))
+    assert [block.section for block in blocks] == [
+        "設定",
+        "設定",
+        "設定",
+        "使い方",
+        "使い方",
+    ]
+    assert blocks[1].text == "```bash\n# not heading\nsudo apt install foo\n```"
@@ -0,0 +1,59 @@
+import pytest
+
+from lib.retrieval_gate import RetrievalGate
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "こんにちは。",
+        "おはようございます！",
+        "ありがとう",
+        "なるほどね",
+        "うん",
+        "へえ、すごいね",
+    ],
+)
+def test_skip_chitchat(text):
+    gate = RetrievalGate()
+    assert not gate.needs_retrieval(text)
+    assert gate.get_metrics()["skipped_chitchat"] == 1
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "おはよう、今日の天気は？",
+        "充電の方法を教えて",
+        "ありがとう、次は何をすればいい？",
+    ],
+)
+def test_search_questions(text):
+    gate = RetrievalGate()
+    assert gate.needs_retrieval(text)
+    assert gate.get_metrics()["searched"] == 1
+
+
+def test_skip_short_utterance():
+    gate = RetrievalGate(min_length=2)
+    assert not gate.needs_retrieval("あ。")
+    assert not gate.needs_retrieval("  ！")
+    assert gate.get_metrics()["skipped_short"] == 2
+
+
+def test_distance_threshold():
+    gate = RetrievalGate(max_distance=0.5)
+    assert gate.is_relevant(0.3)
+    assert gate.is_relevant(0.5)
+    assert not gate.is_relevant(0.51)
+    assert not gate.is_relevant(None)
+    metrics = gate.get_metrics()
+    assert metrics["context_used"] == 2
+    assert metrics["over_max_distance"] == 2
+
+
+def test_no_threshold_uses_context():
+    gate = RetrievalGate()
+    assert gate.is_relevant(None)
+    assert gate.is_relevant(1.5)
+    assert gate.get_metrics()["over_max_distance"] == 0
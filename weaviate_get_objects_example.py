@@ -14,6 +14,12 @@ def main() -> None:
         default="Test",
         help="Weaviate collection name",
     )
+    parser.add_argument(
+        "-t",
+        "--tenant",
+        type=str,
+        help="Tenant name in a multi-tenant collection",
+    )
     parser.add_argument(
         "-n",
         "--name",
@@ -42,10 +48,12 @@ def main() -> None:
         return
     if args.name is not None:
         list = weaviate_controller.get_objects_by_source(
-            source=args.name, collection_name=args.collection
+            source=args.name, collection_name=args.collection, tenant=args.tenant
         )
     else:
-        list = weaviate_controller.get_objects(collection_name=args.collection)
+        list = weaviate_controller.get_objects(
+            collection_name=args.collection, tenant=args.tenant
+        )
     if args.sort_by_date:
         list.sort(key=lambda item: item.properties["date"])
     else:
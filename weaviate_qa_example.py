@@ -1,10 +1,221 @@
 import argparse
+import csv
+import json
+import statistics
 import time
+from concurrent import futures
+from typing import Any, Dict, Iterable, List, Optional
 
 from lib.akari_chatgpt_bot.lib.chat_akari import ChatStreamAkari
-from lib.prompt_creator import system_prompt_creator
+from lib.prompt_creator import (
+    count_tokens,
+    static_system_prompt_creator,
+    user_prompt_creator,
+)
 from lib.weaviate_rag_controller import WeaviateRagController
 
+REPORT_FIELDS = [
+    "question_index",
+    "question",
+    "model",
+    "search_time",
+    "first_sentence_time",
+    "total_time",
+    "prompt_tokens_estimated",
+    "completion_tokens_estimated",
+    "answer",
+    "error",
+]
+
+
+def search_context(
+    weaviate_controller: WeaviateRagController,
+    collection_name: str,
+    text: str,
+    tenant: Optional[str] = None,
+) -> str:
+    """
+    Weaviateで検索し、検索結果を連結したコンテキストを返す
+
+    Args:
+        weaviate_controller(WeaviateRagController): Weaviateのコントローラ
+        collection_name(str): コレクション名
+        text(str): 検索クエリ
+        tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+
+    Returns:
+        str: 検索結果を連結したコンテキスト
+    """
+    response = weaviate_controller.hybrid_search(
+        text=text,
+        limit=3,
+        alpha=0.75,
+        rerank=False,
+        collection_name=collection_name,
+        tenant=tenant,
+    )
+    contexts = ""
+    for p in response.objects:
+        contexts += p.properties["content"]
+    return contexts
+
+
+def generate_answer(
+    chat_stream: ChatStreamAkari, messages: List[Dict[str, Any]], model: str
+) -> Dict[str, Any]:
+    """
+    1つのモデルで回答を生成し、応答時間を計測してトークン数を推定する
+    チャットクライアントは文単位で返し、APIのusageも返さないため、最初の文までの時間とtiktokenによる推定値を記録する。
+
+    Args:
+        chat_stream(ChatStreamAkari): モデルごとのチャットクライアント
+        messages(List[Dict[str, Any]]): メッセージリスト
+        model(str): モデル名
+
+    Returns:
+        Dict[str, Any]: 計測結果と回答
+    """
+    result = {"model": model, "first_sentence_time": None, "answer": "", "error": ""}
+    start = time.time()
+    try:
+        for sentence in chat_stream.chat(messages, model=model, temperature=0.2):
+            if result["first_sentence_time"] is None:
+                result["first_sentence_time"] = time.time() - start
+            result["answer"] += sentence
+    except Exception as e:
+        result["error"] = str(e)
+    result["total_time"] = time.time() - start
+    # OpenAI以外のモデルは各社のトークナイザーではなく、o200k_baseで数えた参考値
+    # 推定に失敗しても他の結果は記録できるよう、トークン数は空にして続ける
+    result["prompt_tokens_estimated"] = None
+    result["completion_tokens_estimated"] = None
+    try:
+        result["prompt_tokens_estimated"] = sum(
+            count_tokens(str(message["content"]), model) for message in messages
+        )
+        result["completion_tokens_estimated"] = count_tokens(result["answer"], model)
+    except Exception as e:
+        print(f"Failed to estimate tokens for {model}: {e}")
+    return result
+
+
+def format_mean(values: Iterable[Optional[float]]) -> str:
+    """
+    Noneを除いた値の平均を表示用の文字列にする
+
+    Args:
+        values(Iterable[Optional[float]]): 値のリスト
+
+    Returns:
+        str: 平均。値がない場合は"-"。
+    """
+    values = [value for value in values if value is not None]
+    if len(values) == 0:
+        return "-"
+    return f"{statistics.mean(values):.2f}"
+
+
+def write_report(results: List[Dict[str, Any]], output_path: str) -> None:
+    """
+    評価結果をCSVもしくはJSONで保存する。拡張子が.jsonの場合はJSON、それ以外はCSV。
+
+    Args:
+        results(List[Dict[str, Any]]): 評価結果
+        output_path(str): 保存先のパス
+    """
+    if output_path.endswith(".json"):
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+    # Excelで文字化けしないようBOM付きで保存する
+    with open(output_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def evaluate(
+    weaviate_controller: WeaviateRagController,
+    collection_name: str,
+    models: List[str],
+    question_path: str,
+    output_path: str,
+    tenant: Optional[str] = None,
+) -> None:
+    """
+    ファイルの質問を順に検索し、同じ検索結果を使って全モデルで並列に回答を生成する
+
+    Args:
+        weaviate_controller(WeaviateRagController): Weaviateのコントローラ
+        collection_name(str): コレクション名
+        models(List[str]): モデル名リスト
+        question_path(str): 質問ファイルのパス。1行に1問
+        output_path(str): 評価結果の保存先のパス
+        tenant(str): テナント名。マルチテナンシーのコレクションの場合に指定する。
+    """
+    with open(question_path, "r", encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip() != ""]
+    # スレッド間で共有しないよう、モデルごとにクライアントを作成する
+    chat_streams = {model: ChatStreamAkari() for model in models}
+    system_message = chat_streams[models[0]].create_message(
+        static_system_prompt_creator(), role="system"
+    )
+    results: List[Dict[str, Any]] = []
+    with futures.ThreadPoolExecutor(max_workers=len(models)) as executor:
+        for i, question in enumerate(questions):
+            search_start = time.time()
+            contexts = search_context(
+                weaviate_controller, collection_name, question, tenant
+            )
+            search_time = time.time() - search_start
+            messages = [
+                system_message,
+                chat_streams[models[0]].create_message(
+                    user_prompt_creator(text=question, context=contexts), role="user"
+                ),
+            ]
+            jobs = [
+                executor.submit(generate_answer, chat_streams[model], messages, model)
+                for model in models
+            ]
+            print(f"[{i + 1}/{len(questions)}] {question}")
+            for job in jobs:
+                result = job.result()
+                result.update(
+                    {
+                        "question_index": i,
+                        "question": question,
+                        "search_time": search_time,
+                    }
+                )
+                results.append(result)
+                first_sentence_time = (
+                    "-"
+                    if result["first_sentence_time"] is None
+                    else f"{result['first_sentence_time']:.2f}"
+                )
+                print(
+                    f"  {result['model']}: first_sentence_time: {first_sentence_time} [s]  total_time: {result['total_time']:.2f} [s]"
+                )
+    write_report(results, output_path)
+    print("-------------------------")
+    for model in models:
+        model_results = [
+            result
+            for result in results
+            if result["model"] == model and result["error"] == ""
+        ]
+        if len(model_results) == 0:
+            print(f"{model}: all requests failed")
+            continue
+        # 回答が空で最初の文が出力されなかった結果は、最初の文までの時間の平均に含めない
+        print(
+            f"{model}: first_sentence_time: {format_mean(result['first_sentence_time'] for result in model_results)} [s]  "
+            f"total_time: {statistics.mean(result['total_time'] for result in model_results):.2f} [s]  "
+            f"completion_tokens_estimated: {format_mean(result['completion_tokens_estimated'] for result in model_results)}"
+        )
+    print(f"Report saved to {output_path}")
+
 
 def main() -> None:
     parser = argparse.ArgumentParser()
@@ -25,6 +236,25 @@ def main() -> None:
         default="Test",
         help="Weaviate collection name",
     )
+    parser.add_argument(
+        "-t",
+        "--tenant",
+        type=str,
+        help="Tenant name in a multi-tenant collection",
+    )
+    parser.add_argument(
+        "-q",
+        "--questions",
+        type=str,
+        help="Question file path (one question per line) for batch evaluation",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="qa_report.csv",
+        help="Evaluation report path (.csv or .json)",
+    )
     args = parser.parse_args()
     chat_stream = ChatStreamAkari()
     weaviate_controller = WeaviateRagController(host=args.host, port=args.port)
@@ -35,51 +265,49 @@ def main() -> None:
         )
         print(f"Current collections: {weaviate_controller.get_collections()}")
         return
+    if args.questions is not None:
+        evaluate(
+            weaviate_controller=weaviate_controller,
+            collection_name=args.collection,
+            models=args.model,
+            question_path=args.questions,
+            output_path=args.output,
+            tenant=args.tenant,
+        )
+        return
+    # システムプロンプトは固定し、検索結果は最後のユーザー発話の前に付ける
+    system_message = chat_stream.create_message(
+        static_system_prompt_creator(), role="system"
+    )
     for i in range(0, len(args.model)):
-        messages_list.append([""])
+        messages_list.append([system_message])
     while True:
         print("文章をキーボード入力後、Enterを押してください。")
         text = input("Input: ")
         rag_start = time.time()
-        response = weaviate_controller.hybrid_search(
-            text=text,
-            limit=3,
-            alpha=0.75,
-            rerank=False,
-            collection_name=args.collection,
+        contexts = search_context(
+            weaviate_controller, args.collection, text, args.tenant
         )
         print(f"search time: {time.time() - rag_start:.2f} [s]")
-        contexts = ""
-        """
-            print(f"distance: {p.metadata.distance}")
-            print(f"certainty: {p.metadata.certainty}")
-            print(f"score: {p.metadata.score}")
-            print(f"explain_score: {p.metadata.explain_score}")
-            print(f"source: {p.properties['source']}")
-            print(f"content: {p.properties['content']}")
-            print()
-        """
-        for p in response.objects:
-            contexts += p.properties["content"]
-        system_prompt = system_prompt_creator(context=contexts)
+        user_prompt = user_prompt_creator(text=text, context=contexts)
         for i, model in enumerate(args.model):
-            messages_list[i][0] = chat_stream.create_message(
-                system_prompt, role="system"
-            )
-            messages_list[i].append(chat_stream.create_message(text, role="user"))
             response = ""
             start = time.time()
             is_first = True
             output_delay = 0.0
             for sentence in chat_stream.chat(
-                messages_list[i], model=model, temperature=0.2
+                messages_list[i]
+                + [chat_stream.create_message(user_prompt, role="user")],
+                model=model,
+                temperature=0.2,
             ):
                 response += sentence
                 print(sentence, end="", flush=True)
                 if is_first:
                     output_delay = time.time() - start
                     is_first = False
-            # chatGPTの返答をassistantメッセージとして追加
+            # 検索結果を除いたユーザー発話と、chatGPTの返答を会話履歴に追加
+            messages_list[i].append(chat_stream.create_message(text, role="user"))
             messages_list[i].append(
                 chat_stream.create_message(response, role="assistant")
             )
@@ -14,6 +14,12 @@ def main() -> None:
         type=str,
         help="Weaviate collection name",
     )
+    parser.add_argument(
+        "-t",
+        "--tenant",
+        type=str,
+        help="Tenant name in a multi-tenant collection",
+    )
     parser.add_argument(
         "-s",
         "--show_objects",
@@ -23,7 +29,9 @@ def main() -> None:
     args = parser.parse_args()
     weaviate_controller = WeaviateRagController(host=args.host, port=args.port)
     if args.show_objects:
-        list = weaviate_controller.get_objects(collection_name=args.collection)
+        list = weaviate_controller.get_objects(
+            collection_name=args.collection, tenant=args.tenant
+        )
         for item in list:
             print(f"source: {item.properties['source']}")
             print(f"uuid: {item.uuid}")
@@ -40,7 +48,16 @@ def main() -> None:
             alpha=0.75,
             rerank=False,
             collection_name=args.collection,
+            tenant=args.tenant,
+        )
+        # 関連度の目安。rag_gpt_publisher.pyの--max_distanceの調整に使う
+        nearest = weaviate_controller.vector_search(
+            collection_name=args.collection, text=text, limit=1, tenant=args.tenant
+        )
+        distance = (
+            nearest.objects[0].metadata.distance if len(nearest.objects) > 0 else None
         )
+        print(f"nearest distance: {distance}")
         for p in response.objects:
             print(f"distance: {p.metadata.distance}")
             print(f"certainty: {p.metadata.certainty}")
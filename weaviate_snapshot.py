@@ -0,0 +1,73 @@
+import argparse
+
+from lib.index_profile import INDEX_PROFILES
+from lib.weaviate_rag_controller import SNAPSHOT_DTYPES, WeaviateRagController
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Weaviate host")
+    parser.add_argument("--port", type=int, default=10080, help="Weaviate port")
+    parser.add_argument(
+        "command",
+        type=str,
+        choices=["export", "import"],
+        help="Export collection to snapshot file or import snapshot file to collection",
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        type=str,
+        default="Test",
+        help="Weaviate collection name",
+    )
+    parser.add_argument(
+        "-t",
+        "--tenant",
+        type=str,
+        help="Tenant name in a multi-tenant collection",
+    )
+    parser.add_argument(
+        "-f", "--file", type=str, required=True, help="Snapshot file path (.npz)"
+    )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float16",
+        choices=SNAPSHOT_DTYPES,
+        help="Vector dtype in snapshot file",
+    )
+    parser.add_argument(
+        "--index_profile",
+        type=str,
+        default="default",
+        choices=INDEX_PROFILES.keys(),
+        help="Vector index profile used when creating the collection",
+    )
+    parser.add_argument(
+        "-r",
+        "--remove",
+        action="store_true",
+        help="Remove the collection (or the tenant if --tenant is set) before importing",
+    )
+    args = parser.parse_args()
+    weaviate_controller = WeaviateRagController(host=args.host, port=args.port)
+    if args.command == "export":
+        weaviate_controller.export_collection(
+            collection_name=args.collection,
+            file_path=args.file,
+            dtype=args.dtype,
+            tenant=args.tenant,
+        )
+    else:
+        weaviate_controller.import_collection(
+            collection_name=args.collection,
+            file_path=args.file,
+            remove=args.remove,
+            index_profile=args.index_profile,
+            tenant=args.tenant,
+        )
+
+
+if __name__ == "__main__":
+    main()
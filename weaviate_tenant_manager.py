@@ -0,0 +1,82 @@
+import argparse
+
+from lib.index_profile import INDEX_PROFILES
+from lib.weaviate_rag_controller import WeaviateRagController
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Weaviate host")
+    parser.add_argument("--port", type=int, default=10080, help="Weaviate port")
+    parser.add_argument(
+        "command",
+        type=str,
+        choices=["list", "create", "activate", "deactivate", "offload", "remove"],
+        help="Tenant operation. deactivate keeps data on local disk, offload moves it to cloud storage",
+    )
+    parser.add_argument(
+        "-c",
+        "--collection",
+        type=str,
+        default="Test",
+        help="Weaviate collection name",
+    )
+    parser.add_argument(
+        "-t",
+        "--tenants",
+        nargs="+",
+        type=str,
+        default=[],
+        help="Tenant names (e.g. robot or site IDs)",
+    )
+    parser.add_argument(
+        "--index_profile",
+        type=str,
+        default="default",
+        choices=INDEX_PROFILES.keys(),
+        help="Vector index profile used when creating the collection",
+    )
+    args = parser.parse_args()
+    weaviate_controller = WeaviateRagController(host=args.host, port=args.port)
+    if args.command == "create":
+        weaviate_controller.ensure_collection_exists(
+            collection_name=args.collection,
+            index_profile=args.index_profile,
+            multi_tenancy=True,
+        )
+    if not weaviate_controller.check_collection_available(args.collection):
+        print(f"Collection {args.collection} does not exist.")
+        print(f"Current collections: {weaviate_controller.get_collections()}")
+        return
+    if args.command != "list" and len(args.tenants) == 0:
+        print("Tenant name is not available. Please specify tenant names with '-t'.")
+        return
+    for tenant in args.tenants:
+        if args.command == "create":
+            weaviate_controller.ensure_tenant_exists(
+                collection_name=args.collection, tenant=tenant
+            )
+        elif args.command == "activate":
+            weaviate_controller.activate_tenant(
+                collection_name=args.collection, tenant=tenant
+            )
+        elif args.command == "deactivate":
+            weaviate_controller.deactivate_tenant(
+                collection_name=args.collection, tenant=tenant
+            )
+        elif args.command == "offload":
+            weaviate_controller.deactivate_tenant(
+                collection_name=args.collection, tenant=tenant, offload=True
+            )
+        elif args.command == "remove":
+            weaviate_controller.remove_tenant(
+                collection_name=args.collection, tenant=tenant
+            )
+    tenants = weaviate_controller.get_tenants(args.collection)
+    for name, status in sorted(tenants.items()):
+        print(f"{name}: {status}")
+    print(f"Total tenants: {len(tenants)}")
+
+
+if __name__ == "__main__":
+    main()
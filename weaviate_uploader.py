@@ -1,6 +1,8 @@
 import argparse
 import os
 
+from lib.index_profile import INDEX_PROFILES
+from lib.upload_checkpoint import UploadCheckpoint
 from lib.weaviate_rag_controller import WeaviateRagController
 
 
@@ -17,11 +19,51 @@ def main() -> None:
         default="Test",
         help="Weaviate collection",
     )
+    parser.add_argument(
+        "-t",
+        "--tenant",
+        type=str,
+        help="Tenant name (e.g. robot or site ID) in a multi-tenant collection",
+    )
     parser.add_argument(
         "-r",
         "--remove",
         action="store_true",
-        help="Remove the collection before uploading",
+        help="Remove the collection (or the tenant if --tenant is set) before uploading",
+    )
+    parser.add_argument(
+        "--dedup_index",
+        type=str,
+        help="Dedup index file path to skip duplicate chunks",
+    )
+    parser.add_argument(
+        "--dedup_threshold",
+        type=float,
+        default=0.8,
+        help="Similarity threshold for near-duplicate chunks",
+    )
+    parser.add_argument(
+        "--index_profile",
+        type=str,
+        default="default",
+        choices=INDEX_PROFILES.keys(),
+        help="Vector index profile used when creating the collection",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="Checkpoint file path to resume interrupted upload",
+    )
+    parser.add_argument(
+        "--requests_per_minute",
+        type=int,
+        help="Max requests per minute for uploading",
+    )
+    parser.add_argument(
+        "--max_retries",
+        type=int,
+        default=3,
+        help="Max retries for failed chunks",
     )
     args = parser.parse_args()
     # アップローダーの初期化
@@ -32,7 +74,20 @@ def main() -> None:
         )
         print(f"Current collections: {weaviate_controller.get_collections()}")
     if args.remove:
-        weaviate_controller.remove_collection(collection_name=args.collection)
+        if args.tenant is None:
+            weaviate_controller.remove_collection(collection_name=args.collection)
+        elif weaviate_controller.check_collection_available(
+            args.collection
+        ) and args.tenant in weaviate_controller.get_tenants(args.collection):
+            weaviate_controller.remove_tenant(
+                collection_name=args.collection, tenant=args.tenant
+            )
+        if args.checkpoint is not None:
+            UploadCheckpoint(args.checkpoint).reset(
+                collection_name=args.collection, tenant=args.tenant
+            )
+        if args.dedup_index is not None and os.path.exists(args.dedup_index):
+            os.remove(args.dedup_index)
     file_paths = []
     if args.path is None:
         print("Path is not available")
@@ -46,10 +101,21 @@ def main() -> None:
     else:
         file_paths.append(args.path)
     if len(file_paths) > 0:
+        weaviate_controller.ensure_collection_exists(
+            collection_name=args.collection,
+            index_profile=args.index_profile,
+            multi_tenancy=args.tenant is not None,
+        )
         results = weaviate_controller.upload_files(
             collection_name=args.collection,
             file_paths=file_paths,
             parent_path=args.path,
+            checkpoint_path=args.checkpoint,
+            requests_per_minute=args.requests_per_minute,
+            max_retries=args.max_retries,
+            dedup_index_path=args.dedup_index,
+            dedup_threshold=args.dedup_threshold,
+            tenant=args.tenant,
         )
     else:
         print(f"No files found in {args.path}")